@@ -0,0 +1,149 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""
+Helpers for generating the synthetic files the benchmarks run on.
+
+Everything is created on the fly in a temporary directory, so the
+benchmarks do not depend on any data files being present.
+"""
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from astropy.wcs import WCS
+
+from jwst_lib import models
+
+
+IMAGE_SHAPE = (2048, 2048)
+RAMP_SHAPE = (2, 10, 1024, 1024)
+LARGE_RAMP_SHAPE = (4, 30, 2048, 2048)
+NSLITS = 200
+SLIT_SHAPE = (40, 400)
+NPHOT_ROWS = 500
+NMEMBERS = 100
+MEMBER_SHAPE = (512, 512)
+
+
+class TempDir(object):
+    """
+    Mixin for benchmark classes that need a scratch directory.
+    """
+    def setup_tempdir(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self, *args):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+
+def make_image_model():
+    data = np.random.rand(*IMAGE_SHAPE).astype(np.float32)
+    model = models.ImageModel(data=data)
+    model.meta.instrument.name = 'NIRCAM'
+    model.meta.subarray.xstart = 1
+    return model
+
+
+def make_wcs():
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ['RA---TAN', 'DEC--TAN']
+    wcs.wcs.crval = [53.16, -27.79]
+    wcs.wcs.crpix = [IMAGE_SHAPE[1] / 2, IMAGE_SHAPE[0] / 2]
+    wcs.wcs.cdelt = [-0.0000175, 0.0000175]
+    return wcs
+
+
+def make_dq_array():
+    # Sparse flags, as in a real DQ extension
+    dq = np.zeros(IMAGE_SHAPE, dtype=np.uint32)
+    flagged = np.random.rand(*IMAGE_SHAPE) < 0.01
+    dq[flagged] = np.random.randint(1, 8, flagged.sum())
+    return dq
+
+
+def make_association(directory, nmembers=NMEMBERS):
+    # Writes the member exposures of an association into *directory*,
+    # among some unrelated files, and returns its table.
+    rows = []
+    for i in range(nmembers):
+        rootname = os.path.join(directory, 'member{0:03d}'.format(i))
+        data = np.random.rand(*MEMBER_SHAPE).astype(np.float32)
+        with models.ImageModel(data=data) as model:
+            model.save(rootname + '.fits')
+        with open(rootname + '_cal.txt', 'w'):
+            pass
+        rows.append((rootname, 'SCIENCE'))
+    rows.append((os.path.join(directory, 'product'), 'PRODUCT'))
+    return np.rec.array(rows, dtype=[(str('expname'), 'S80'),
+                                     (str('exptype'), 'S15')])
+
+
+def make_ramp_model():
+    data = np.random.rand(*RAMP_SHAPE).astype(np.float32)
+    model = models.RampModel(data=data)
+    model.meta.instrument.name = 'NIRCAM'
+    return model
+
+
+def make_large_ramp_model():
+    # A multi-GB ramp; the content does not matter, so leave the pages
+    # to be zeroed on demand rather than filling them with noise.
+    model = models.RampModel(
+        data=np.zeros(LARGE_RAMP_SHAPE, dtype=np.float32))
+    model.meta.instrument.name = 'NIRCAM'
+    return model
+
+
+def make_multislit_model():
+    model = models.MultiSlitModel()
+    for i in range(NSLITS):
+        slit = model.slits.item()
+        slit.data = np.random.rand(*SLIT_SHAPE).astype(np.float32)
+        slit.name = 'SLIT{0}'.format(i)
+        model.slits.append(slit)
+    return model
+
+
+def make_phot_table(nrows=NPHOT_ROWS):
+    table = np.zeros(nrows, dtype=[
+        (str('filter'), str('S12')),
+        (str('pupil'), str('S12')),
+        (str('photmjsr'), str('<f4')),
+        (str('uncertainty'), str('<f4')),
+        (str('nelem'), str('<i2')),
+        (str('wavelength'), str('<f4'), (50,)),
+        (str('relresponse'), str('<f4'), (50,))])
+    for i in range(nrows):
+        table['filter'][i] = 'F{0:03d}W'.format(i)
+        table['pupil'][i] = 'CLEAR' if i % 2 else 'GRISMR'
+    table['photmjsr'] = np.random.rand(nrows)
+    table['nelem'] = 50
+    table['wavelength'] = np.linspace(1.0, 5.0, 50)
+    table['relresponse'] = np.random.rand(nrows, 50)
+    return table
+
+
+def make_photom_model():
+    return models.NircamPhotomModel(phot_table=make_phot_table())
+
+
+def make_dark_model(nplanes=8):
+    shape = (nplanes,) + IMAGE_SHAPE
+    dq_def = np.array(
+        [(0, 1, str('DO_NOT_USE'), str('')),
+         (1, 2, str('HOT'), str('')),
+         (2, 4, str('WARM'), str(''))],
+        dtype=[(str('BIT'), str('<i4')),
+               (str('VALUE'), str('<i4')),
+               (str('NAME'), str('S40')),
+               (str('DESCRIPTION'), str('S80'))])
+    dq = np.random.randint(0, 8, IMAGE_SHAPE).astype(np.uint32)
+    return models.DarkModel(
+        data=np.zeros(shape, np.float32), dq=dq, dq_def=dq_def)
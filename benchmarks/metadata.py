@@ -0,0 +1,80 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for metadata access and validation, and for the work done
+in the reference file model constructors.
+"""
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+from jwst_lib import models
+from jwst_lib.models.dynamicdq import dynamic_mask
+
+from . import common
+
+
+class MetadataAccess(object):
+    def setup(self):
+        self.model = common.make_image_model()
+
+    def time_setattr(self):
+        self.model.meta.instrument.name = 'MIRI'
+
+    def time_setattr_1000(self):
+        meta = self.model.meta.instrument
+        for i in range(1000):
+            meta.name = 'MIRI'
+
+    def time_getattr_1000(self):
+        meta = self.model.meta.instrument
+        for i in range(1000):
+            meta.name
+
+    def time_setitem(self):
+        self.model['meta.subarray.xstart'] = 42
+
+    def time_to_flat_dict(self):
+        self.model.to_flat_dict(include_arrays=False)
+
+
+class MetadataAssignment(object):
+    """
+    Many validated metadata assignments, as in a metadata-heavy step.
+    """
+    number = 1
+    repeat = 3
+
+    def setup(self):
+        self.model = common.make_image_model()
+
+    def time_setattr_10000(self):
+        meta = self.model.meta.subarray
+        for i in range(10000):
+            meta.xstart = i
+
+    def time_validate(self):
+        self.model.validate()
+
+
+class DynamicMask(object):
+    def setup(self):
+        self.model = common.make_dark_model()
+
+    def time_dynamic_mask(self):
+        dynamic_mask(self.model)
+
+    def peakmem_dynamic_mask(self):
+        dynamic_mask(self.model)
+
+
+class ReferenceModelConstruct(common.TempDir):
+    def setup(self):
+        self.setup_tempdir()
+        common.make_dark_model().save(self.path('dark.fits'))
+
+    def time_open_dark(self):
+        with models.DarkModel(self.path('dark.fits')) as model:
+            model.dq
+
+    def peakmem_open_dark(self):
+        with models.DarkModel(self.path('dark.fits')) as model:
+            model.dq
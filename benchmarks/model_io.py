@@ -0,0 +1,391 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for opening and saving models of the common types.
+
+Each class writes its synthetic input file once in `setup` and
+measures both the time and the peak memory of the public entry
+points.
+"""
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import os
+import pickle
+
+import numpy as np
+
+from astropy.io import fits
+from astropy.wcs import WCS
+
+from jwst_lib import models
+from jwst_lib.models import fits_support
+from jwst_lib.models import util
+
+from . import common
+
+
+class ImageModelIO(common.TempDir):
+    def setup(self):
+        self.setup_tempdir()
+        self.model = common.make_image_model()
+        self.model.save(self.path('image.fits'))
+
+    def time_open(self):
+        with models.ImageModel(self.path('image.fits')) as model:
+            model.data
+
+    def peakmem_open(self):
+        with models.ImageModel(self.path('image.fits')) as model:
+            model.data
+
+    def time_open_generic(self):
+        with models.open(self.path('image.fits')) as model:
+            model.data
+
+    def time_save(self):
+        self.model.save(self.path('out.fits'))
+
+    def peakmem_save(self):
+        self.model.save(self.path('out.fits'))
+
+    def time_save_asdf(self):
+        self.model.save(self.path('out.asdf'))
+
+    def time_new_from_shape(self):
+        models.ImageModel(common.IMAGE_SHAPE)
+
+
+class RampModelIO(common.TempDir):
+    def setup(self):
+        self.setup_tempdir()
+        self.model = common.make_ramp_model()
+        self.model.save(self.path('ramp.fits'))
+
+    def time_open(self):
+        with models.RampModel(self.path('ramp.fits')) as model:
+            model.data
+
+    def peakmem_open(self):
+        with models.RampModel(self.path('ramp.fits')) as model:
+            model.data
+
+    def time_save(self):
+        self.model.save(self.path('out.fits'))
+
+    def peakmem_save(self):
+        self.model.save(self.path('out.fits'))
+
+    def time_new_from_shape(self):
+        models.RampModel(common.RAMP_SHAPE)
+
+    def peakmem_new_from_shape(self):
+        models.RampModel(common.RAMP_SHAPE)
+
+
+class CompressedFits(common.TempDir):
+    """
+    Gzipped and tile-compressed FITS output, compared to plain FITS.
+    The ``track_`` benchmarks report the file size in bytes.
+    """
+    def setup(self):
+        self.setup_tempdir()
+        self.model = common.make_image_model()
+        self.model.dq = common.make_dq_array()
+        self.model.save(self.path('plain.fits'))
+        self.model.save(self.path('gzip.fits.gz'))
+        self.model.save(self.path('tiled.fits'), compression=True)
+
+    def time_save_gzip(self):
+        self.model.save(self.path('out.fits.gz'))
+
+    def time_save_tile_compressed(self):
+        self.model.save(self.path('out.fits'), compression=True)
+
+    def time_open_gzip(self):
+        with models.ImageModel(self.path('gzip.fits.gz')) as model:
+            model.data
+            model.dq
+
+    def time_open_tile_compressed(self):
+        with models.ImageModel(self.path('tiled.fits')) as model:
+            model.data
+            model.dq
+
+    def track_size_plain(self):
+        return os.path.getsize(self.path('plain.fits'))
+
+    def track_size_gzip(self):
+        return os.path.getsize(self.path('gzip.fits.gz'))
+
+    def track_size_tile_compressed(self):
+        return os.path.getsize(self.path('tiled.fits'))
+
+
+class LargeRampUpdate(common.TempDir):
+    """
+    Changing a keyword and the pixel DQ of a multi-GB ramp, and saving
+    it back to the same file either in place or in full.
+    """
+    timeout = 1800
+    number = 1
+    repeat = 3
+
+    def setup(self):
+        self.setup_tempdir()
+        with common.make_large_ramp_model() as model:
+            model.save(self.path('ramp.fits'))
+
+    def update(self, **kwargs):
+        with models.RampModel(self.path('ramp.fits')) as model:
+            model.meta.instrument.name = 'NIRSPEC'
+            model.pixeldq[0, 0] = 1
+            model.save(self.path('ramp.fits'), **kwargs)
+
+    def time_update_in_place(self):
+        self.update(update_in_place=True)
+
+    def peakmem_update_in_place(self):
+        self.update(update_in_place=True)
+
+    def time_full_rewrite(self):
+        self.update()
+
+
+class MultiSlitModelIO(common.TempDir):
+    timeout = 300
+
+    def setup(self):
+        self.setup_tempdir()
+        self.model = common.make_multislit_model()
+        self.model.save(self.path('multislit.fits'))
+
+    def time_open(self):
+        with models.MultiSlitModel(self.path('multislit.fits')) as model:
+            model.slits[common.NSLITS - 1].data
+
+    def peakmem_open(self):
+        with models.MultiSlitModel(self.path('multislit.fits')) as model:
+            model.slits[common.NSLITS - 1].data
+
+    def time_save(self):
+        self.model.save(self.path('out.fits'))
+
+
+class PhotomModelIO(common.TempDir):
+    def setup(self):
+        self.setup_tempdir()
+        self.model = common.make_photom_model()
+        self.model.save(self.path('photom.fits'))
+
+    def time_open(self):
+        with models.NircamPhotomModel(self.path('photom.fits')) as model:
+            model.phot_table
+
+    def time_table_access(self):
+        for i in range(100):
+            self.model.phot_table
+
+    def time_cast_fits_table(self):
+        # Viewing the FITS_rec from the file with the column names and
+        # byte order of the schema, as on open
+        with fits.open(self.path('photom.fits')) as hdulist:
+            table = hdulist['PHOTOM'].data
+            for i in range(100):
+                util.gentle_asarray(table, self.model.phot_table.dtype)
+
+    def time_save(self):
+        self.model.save(self.path('out.fits'))
+
+
+class Association(common.TempDir):
+    """
+    Resolving the members of an association and streaming through
+    their models.
+    """
+    timeout = 300
+
+    def setup(self):
+        self.setup_tempdir()
+        self.asn_table = common.make_association(self.tmpdir)
+        self.asn = models.AsnModel(asn_table=self.asn_table)
+
+    def time_parse_table(self):
+        self.asn.parse_table()
+
+    def time_iter_members(self):
+        for model in self.asn.iter_members(models.ImageModel):
+            with model:
+                model.data.sum()
+
+    def time_iter_members_prefetch(self):
+        for model in self.asn.iter_members(models.ImageModel, prefetch=4):
+            with model:
+                model.data.sum()
+
+    def peakmem_iter_members(self):
+        for model in self.asn.iter_members(models.ImageModel):
+            with model:
+                model.data.sum()
+
+
+class StackedMedian(common.TempDir):
+    """
+    The median over the members of an association, computed tile by
+    tile from a stacked view, against loading every member first.
+    """
+    timeout = 300
+
+    def setup(self):
+        self.setup_tempdir()
+        self.asn = models.AsnModel(
+            asn_table=common.make_association(self.tmpdir))
+
+    def _median_tiles(self):
+        with self.asn.stack_members(model_class=models.ImageModel) as stack:
+            median = np.empty(stack.shape[1:], dtype=stack.dtype)
+            for index, block in stack.iter_tiles((128, 128)):
+                median[index] = np.median(block, axis=0)
+        return median
+
+    def _median_loaded(self):
+        arrays = []
+        for model in self.asn.iter_members(models.ImageModel):
+            with model:
+                arrays.append(np.array(model.data))
+        return np.median(arrays, axis=0)
+
+    def time_median_tiles(self):
+        self._median_tiles()
+
+    def peakmem_median_tiles(self):
+        self._median_tiles()
+
+    def time_median_loaded(self):
+        self._median_loaded()
+
+    def peakmem_median_loaded(self):
+        self._median_loaded()
+
+
+class RampModelPickle(object):
+    """
+    Round-tripping a 4-D ramp through pickle, as when sending it to a
+    worker process.
+    """
+    def setup(self):
+        self.model = common.make_ramp_model()
+
+    def time_roundtrip(self):
+        pickle.loads(pickle.dumps(self.model, pickle.HIGHEST_PROTOCOL))
+
+    def peakmem_roundtrip(self):
+        pickle.loads(pickle.dumps(self.model, pickle.HIGHEST_PROTOCOL))
+
+
+class RampModelPickleOutOfBand(object):
+    """
+    Round-tripping a 4-D ramp through pickle protocol 5, with the
+    arrays passed out-of-band.
+    """
+    def setup(self):
+        if pickle.HIGHEST_PROTOCOL < 5:
+            raise NotImplementedError("Requires pickle protocol 5")
+        self.model = common.make_ramp_model()
+
+    def time_roundtrip(self):
+        buffers = []
+        data = pickle.dumps(self.model, 5, buffer_callback=buffers.append)
+        pickle.loads(data, buffers=buffers)
+
+
+class FitsSupport(object):
+    """
+    The FITS conversion layer on its own, without the model
+    constructor or `save` around it.
+    """
+    def setup(self):
+        self.model = common.make_image_model()
+        self.model.meta.instrument.name = 'NIRCAM'
+        self.model.set_fits_wcs(common.make_wcs(), hdu_name='SCI')
+        self.hdulist = self.model_to_hdulist()
+
+    def model_to_hdulist(self):
+        ff = fits_support.to_fits(self.model._instance, self.model._schema)
+        return ff._hdulist
+
+    def time_to_fits(self):
+        fits_support.to_fits(self.model._instance, self.model._schema)
+
+    def peakmem_to_fits(self):
+        fits_support.to_fits(self.model._instance, self.model._schema)
+
+    def time_from_fits(self):
+        fits_support.from_fits(self.hdulist, self.model._schema)
+
+    def peakmem_from_fits(self):
+        fits_support.from_fits(self.hdulist, self.model._schema)
+
+    def time_get_fits_header(self):
+        self.model.get_fits_header('PRIMARY')
+
+    def time_get_fits_wcs(self):
+        # Without the cache, every call builds the header and parses it
+        self.model._fits_wcs_cache.clear()
+        self.model.get_fits_wcs('SCI')
+
+    def time_get_fits_wcs_cached(self):
+        self.model.get_fits_wcs('SCI')
+
+    def time_get_fits_wcs_from_hdulist(self):
+        # The way get_fits_wcs used to work, for comparison
+        hdulist = self.model_to_hdulist()
+        WCS(hdulist['SCI'].header, relax=True, fix=True)
+
+
+class HeaderBatch(object):
+    """
+    Writing the headers of a core.schema.yaml sized model many times
+    over, as a batch step would.
+    """
+    number = 1
+    repeat = 3
+
+    def setup(self):
+        self.model = models.DataModel()
+        self.model.meta.instrument.name = 'NIRCAM'
+        self.model.meta.subarray.xstart = 1
+
+    def time_to_fits_1000(self):
+        for i in range(1000):
+            fits_support.to_fits(self.model._instance, self.model._schema)
+
+    def time_get_fits_header_1000(self):
+        for i in range(1000):
+            self.model.get_fits_header('PRIMARY')
+
+
+class Construct(object):
+    """
+    Creating many small, empty models, as the steps do for their
+    outputs.  Each benchmark makes 100 instances.
+    """
+    def time_datamodel(self):
+        for i in range(100):
+            models.DataModel()
+
+    def time_image_shape(self):
+        for i in range(100):
+            models.ImageModel((32, 32))
+
+    def time_cube_shape(self):
+        for i in range(100):
+            models.CubeModel((4, 32, 32))
+
+    def time_ramp_shape(self):
+        for i in range(100):
+            models.RampModel((1, 4, 32, 32))
+
+    def time_image_copy(self):
+        model = models.ImageModel((32, 32))
+        for i in range(100):
+            model.copy()
@@ -31,6 +31,7 @@ from __future__ import absolute_import, unicode_literals, division, print_functi
 
 import numpy as np
 
+from . import model_base
 from .model_base import DataModel
 from .amilg import AmiLgModel
 from .asn import AsnModel
@@ -66,6 +67,7 @@ from .saturation import SaturationModel
 from .spec import SpecModel
 from .straylight import StrayLightModel
 from .superbias import SuperBiasModel
+from . import util
 from .util import fits_header_name
 
 from .version import (__version__, __svn_revision__, __svn_full_info__, __setup_datetime__)
@@ -85,6 +87,26 @@ __all__ = [
     'SaturationModel', 'SpecModel', 'StrayLightModel']
 
 
+def _peek_asdf(path, compression=None):
+    # Returns the shape of the data array of an ASDF file and whether
+    # it has a refout array, from its tree alone: the blocks are not
+    # read and no model is built.
+    fd = None
+    if compression is not None:
+        fd = path = util.open_compressed(path, compression)
+    try:
+        asdf = model_base._open_asdf(path)
+        try:
+            data = asdf.tree.get('data')
+            shape = tuple(data.shape) if data is not None else ()
+            return shape, 'refout' in asdf.tree
+        finally:
+            asdf.close()
+    finally:
+        if fd is not None:
+            fd.close()
+
+
 def open(init=None):
     """
     Creates a Model from a number of different types
@@ -117,6 +139,7 @@ def open(init=None):
     """
     from astropy.io import fits
 
+    has_refout = False
     if init is None:
         return DataModel(None)
     elif isinstance(init, DataModel):
@@ -130,23 +153,37 @@ def open(init=None):
     elif isinstance(init, np.ndarray):
         shape = init.shape
     else:
-        if isinstance(init, (unicode, bytes)) or hasattr(init, "read"):
-            hdulist = fits.open(init)
-        elif isinstance(init, fits.HDUList):
-            hdulist = init
-        else:
-            raise TypeError(
-                "init must be None, shape tuple, file path, "
-                "readable file object, or astropy.io.fits.HDUList")
+        file_format = None
+        if isinstance(init, (unicode, bytes)):
+            file_format, compression = util.sniff_format(init)
 
-        shape = ()
-        try:
-            hdu = hdulist[fits_header_name('SCI')]
-        except KeyError:
-            pass
+        if file_format == 'asdf':
+            shape, has_refout = _peek_asdf(init, compression)
         else:
-            if hasattr(hdu, 'shape'):
-                shape = hdu.shape
+            if isinstance(init, (unicode, bytes)) or hasattr(init, "read"):
+                hdulist = fits.open(init)
+            elif isinstance(init, fits.HDUList):
+                hdulist = init
+            else:
+                raise TypeError(
+                    "init must be None, shape tuple, file path, "
+                    "readable file object, or astropy.io.fits.HDUList")
+
+            shape = ()
+            try:
+                hdu = hdulist[fits_header_name('SCI')]
+            except KeyError:
+                pass
+            else:
+                if hasattr(hdu, 'shape'):
+                    shape = hdu.shape
+
+            try:
+                hdulist[fits_header_name('REFOUT')]
+            except KeyError:
+                has_refout = False
+            else:
+                has_refout = True
 
     # Here, we try to be clever about which type to
     # return, otherwise, just return a new instance of the
@@ -154,14 +191,12 @@ def open(init=None):
     if len(shape) == 0:
         new_class = DataModel
     elif len(shape) == 4:
-        try:
-            refouthdu = hdulist[fits_header_name('REFOUT')]
-        except KeyError:
-	    from . import ramp
-            new_class = ramp.RampModel
-        else:
+        if has_refout:
             from . import miri_ramp
             new_class = miri_ramp.MIRIRampModel
+        else:
+            from . import ramp
+            new_class = ramp.RampModel
     elif len(shape) == 3:
         from . import cube
         new_class = cube.CubeModel
@@ -1,11 +1,75 @@
 from __future__ import absolute_import, unicode_literals, division, print_function
 
+import collections
 import os
+import sys
+import threading
+
+from astropy.extern import six
+
 from . import model_base
+from . import stacked
 
 __all__ = ['AsnModel']
 
 
+class _MemberResolver(object):
+    """
+    Finds the files of association members, listing each directory
+    once instead of probing the filesystem for every member and
+    format.
+    """
+    def __init__(self, formats):
+        self.formats = formats
+        self._listings = {}
+
+    def _list(self, directory):
+        names = self._listings.get(directory)
+        if names is None:
+            try:
+                names = frozenset(os.listdir(directory or os.curdir))
+            except OSError:
+                names = frozenset()
+            self._listings[directory] = names
+        return names
+
+    def resolve(self, rootname):
+        """
+        Returns the path of the first file named *rootname* with one
+        of the extensions in `formats`, or `None` if there is none.
+        """
+        directory, base = os.path.split(rootname)
+        names = self._list(directory)
+        for fmt in self.formats:
+            name = "{0}.{1}".format(base, fmt)
+            if name in names:
+                return os.path.join(directory, name)
+        return None
+
+
+class _Opener(threading.Thread):
+    # Opens one member in the background
+    def __init__(self, open_member, path):
+        super(_Opener, self).__init__()
+        self.daemon = True
+        self._open_member = open_member
+        self._path = path
+        self.model = None
+        self.exc_info = None
+
+    def run(self):
+        try:
+            self.model = self._open_member(self._path)
+        except Exception:
+            self.exc_info = sys.exc_info()
+
+    def get(self):
+        self.join()
+        if self.exc_info is not None:
+            six.reraise(*self.exc_info)
+        return self.model
+
+
 class AsnModel(model_base.DataModel):
     """
     A data model for association tables.
@@ -32,20 +96,114 @@ class AsnModel(model_base.DataModel):
         if not len(self.asn_table):
             return
 
+        resolver = _MemberResolver(self.supported_formats)
         for i, etype in enumerate(self.asn_table.exptype):
             if 'prod' in etype.lower():
                 self.output_rootname = self.asn_table.expname[i]
-                for fmt in self.supported_formats:
-                    fname = "{0}.{1}".format(self.output_rootname, fmt)
-                    if os.path.exists(fname):
-                        self.output = fname
-                        break
+                fname = resolver.resolve(self.output_rootname)
+                if fname is not None:
+                    self.output = fname
             else:
                 rootname = self.asn_table.expname[i]
-                for fmt in self.supported_formats:
-                    fname = "{0}.{1}".format(rootname, fmt)
-                    if os.path.exists(fname):
-                        self.inputs.append(fname)
-                        break
+                fname = resolver.resolve(rootname)
+                if fname is not None:
+                    self.inputs.append(fname)
                 self.input_rootnames.append(rootname)
                 self.num_inputs += 1
+
+    def iter_members(self, model_class=None, prefetch=0):
+        """
+        Iterate over the models of the input members, opening each one
+        only when it is needed.
+
+        The caller owns the yielded models and should close each one
+        when done with it, so that only a few members are open at any
+        time::
+
+            for model in asn.iter_members(prefetch=2):
+                with model:
+                    ...
+
+        Parameters
+        ----------
+        model_class : DataModel subclass, optional
+            The class used to open the members.  By default,
+            `jwst_lib.models.open` determines it from each file.
+
+        prefetch : int, optional
+            The number of members to open ahead in background threads
+            while the current one is being processed.  By default,
+            members are opened one at a time, on demand.
+
+        Yields
+        ------
+        model : DataModel instance
+        """
+        if model_class is None:
+            from . import open as open_member
+        else:
+            open_member = model_class
+
+        if prefetch <= 0:
+            for path in self.inputs:
+                yield open_member(path)
+            return
+
+        paths = iter(self.inputs)
+        pending = collections.deque()
+        try:
+            while True:
+                while len(pending) <= prefetch:
+                    path = next(paths, None)
+                    if path is None:
+                        break
+                    opener = _Opener(open_member, path)
+                    opener.start()
+                    pending.append(opener)
+                if not pending:
+                    return
+                yield pending.popleft().get()
+        finally:
+            # Close the members that were opened ahead but never handed
+            # out, e.g. when the caller stops iterating early.
+            for opener in pending:
+                opener.join()
+                if opener.model is not None:
+                    opener.model.close()
+
+    def stack_members(self, attribute='data', model_class=None,
+                      max_open=None):
+        """
+        Get a lazily-evaluated stack of an array of the input members.
+
+        Only the members and the parts of their arrays that are
+        indexed are read, so that statistics over many exposures can
+        be computed in bounded memory, e.g. tile by tile with
+        `~jwst_lib.models.stacked.StackedView.iter_tiles`.
+
+        Parameters
+        ----------
+        attribute : str, optional
+            The name of the array to stack.  Defaults to ``'data'``.
+
+        model_class : DataModel subclass, optional
+            The class used to open the members.  By default,
+            `jwst_lib.models.open` determines it from the first
+            member.
+
+        max_open : int, optional
+            The maximum number of members kept open at once.  By
+            default, every member that has been read stays open until
+            the stack is closed.  With fewer members open than there
+            are inputs, most of them are reopened for each tile of
+            `~jwst_lib.models.stacked.StackedView.iter_tiles`.
+
+        Returns
+        -------
+        stack : `~jwst_lib.models.stacked.StackedView`
+            Its first axis runs over `inputs`.  It should be closed
+            when no longer needed.
+        """
+        return stacked.StackedView(
+            self.inputs, attribute=attribute, model_class=model_class,
+            max_open=max_open)
@@ -1,12 +1,13 @@
 from __future__ import absolute_import, unicode_literals, division, print_function
 
 from . import model_base
+from .relsens import _RelsensMixin
 
 
 __all__ = ['CubeModel']
 
 
-class CubeModel(model_base.DataModel):
+class CubeModel(_RelsensMixin, model_base.DataModel):
     """
     A data model for 3D image cubes.
 
@@ -25,6 +26,7 @@ class CubeModel(model_base.DataModel):
         The error array.  3-D
     """
     schema_url = "cube.schema.yaml"
+    _implicit_arrays = ('dq', 'err')
 
     def __init__(self, init=None, data=None, dq=None, err=None, zeroframe=None,
                  relsens=None, area=None, **kwargs):
@@ -47,8 +49,3 @@ class CubeModel(model_base.DataModel):
 
         if area is not None:
             self.area = area
-
-        # Implicitly create arrays
-        self.dq = self.dq
-        self.err = self.err
-
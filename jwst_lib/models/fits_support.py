@@ -14,6 +14,7 @@ import jsonschema
 from astropy.extern import six
 from astropy.io import fits
 from astropy import time
+from astropy.utils.compat.odict import OrderedDict
 
 from pyasdf import fits_embed
 from pyasdf import resolver
@@ -24,12 +25,14 @@ from pyasdf.util import HashableDict
 
 from jsonschema import validators
 
+from . import profiling
 from . import properties
 from . import schema as mschema
 from . import util
 
 
-__all__ = ['to_fits', 'from_fits', 'fits_hdu_name', 'get_hdu']
+__all__ = ['to_fits', 'update_fits', 'from_fits', 'fits_hdu_name', 'get_hdu',
+           'compile_keyword_map', 'get_fits_header', 'get_fits_wcs_header']
 
 
 _builtin_regexes = [
@@ -56,6 +59,36 @@ def _is_builtin_fits_keyword(key):
     return _builtin_regex.match(key) is not None
 
 
+_wcs_regexes = [
+    'WCSAXES[A-Z]?', 'WCSNAME[A-Z]?', 'CRPIX[0-9]+[A-Z]?',
+    'CRVAL[0-9]+[A-Z]?', 'CDELT[0-9]+[A-Z]?', 'CTYPE[0-9]+[A-Z]?',
+    'CUNIT[0-9]+[A-Z]?', 'CROTA[0-9]+', 'CRDER[0-9]+[A-Z]?',
+    'CSYER[0-9]+[A-Z]?', 'PC[0-9]+_[0-9]+[A-Z]?', 'CD[0-9]+_[0-9]+[A-Z]?',
+    'PV[0-9]+_[0-9]+[A-Z]?', 'PS[0-9]+_[0-9]+[A-Z]?', 'LONPOLE[A-Z]?',
+    'LATPOLE[A-Z]?', 'RADESYS[A-Z]?', 'RADECSYS', 'EQUINOX[A-Z]?', 'EPOCH',
+    'DATE-OBS', 'MJD-OBS', 'DATE-AVG', 'MJD-AVG', 'MJDREF[IF]?',
+    'RESTFRQ[A-Z]?', 'RESTFREQ', 'RESTWAV[A-Z]?', 'SPECSYS[A-Z]?',
+    'SSYSOBS[A-Z]?', 'SSYSSRC[A-Z]?', 'VELOSYS[A-Z]?', 'ZSOURCE[A-Z]?',
+    'VELANGL[A-Z]?', 'OBSGEO-[XYZ]', '(A|B|AP|BP)_ORDER', '(A|B|AP|BP)_DMAX',
+    '(A|B|AP|BP)_[0-9]+_[0-9]+', 'CPDIS[0-9]+', 'CQDIS[0-9]+',
+    'CPERR[0-9]+', 'CQERR[0-9]+', 'DP[0-9]+(\\..*)?', 'DQ[0-9]+(\\..*)?',
+    'D2IMDIS[0-9]+', 'D2IMERR[0-9]+', 'D2IMEXT', 'D2IM[0-9]+(\\..*)?',
+    'AXISCORR'
+    ]
+
+
+_wcs_regex = re.compile(
+    '|'.join('(^{0}$)'.format(x) for x in _wcs_regexes))
+
+
+def _is_wcs_keyword(key):
+    """
+    Returns `True` if the given `key` is a FITS WCS keyword, including
+    the SIP and lookup table distortion keywords.
+    """
+    return _wcs_regex.match(key) is not None
+
+
 _keyword_indices = [
     ('nnn', 1000, None),
     ('nn', 100, None),
@@ -155,37 +188,110 @@ def get_hdu(hdulist, hdu_name, index=None):
     return hdu
 
 
-def _make_hdu(hdulist, hdu_name, index=None, hdu_type=None, value=None):
-    if hdu_type is None:
-        if hdu_name in (0, 'PRIMARY'):
-            hdu_type = fits.PrimaryHDU
+class _HDUCards(object):
+    """
+    Collects the cards and the data of a single HDU while a tree is
+    being written, so that the HDU and its header can be created in
+    one go at the end, rather than updating a live
+    `astropy.io.fits.Header` keyword by keyword.
+    """
+    def __init__(self, hdu_name, index=None):
+        self.hdu_name = hdu_name
+        self.index = index
+        self.hdu_type = None
+        self.data = None
+        # The value in the tree that `data` was made from
+        self.source = None
+        # The tile compression algorithm, if any; see
+        # `_resolve_compression`
+        self.compression = None
+        self.cards = []
+        self._positions = {}
+
+    def append(self, keyword, value, comment=''):
+        self._positions.setdefault(keyword, len(self.cards))
+        self.cards.append((keyword, value, comment))
+
+    def set(self, keyword, value, comment=''):
+        # Equivalent to ``header[keyword] = (value, comment)``
+        position = self._positions.get(keyword)
+        if position is None:
+            self.append(keyword, value, comment)
         else:
-            hdu_type = fits.ImageHDU
-    hdu = hdu_type(value, name=hdu_name)
-    if index is not None:
-        hdu.ver = index + 1
-    hdulist.append(hdu)
-    return hdu
+            self.cards[position] = (keyword, value, comment)
+
+    def add_comment_sections(self, sections):
+        for section in sections:
+            self.append(' ', '')
+            self.append(' ', section)
+            self.append(' ', '')
+
+    def to_header(self):
+        return fits.Header(self.cards)
+
+    def to_hdu(self):
+        hdu_type = self.hdu_type
+        if hdu_type is None:
+            if self.hdu_name == 0:
+                hdu_type = fits.PrimaryHDU
+            else:
+                hdu_type = fits.ImageHDU
+        # The header is built in one go and handed to the HDU, which
+        # only adds the structural keywords to it.
+        header = self.to_header()
+        if hdu_type is fits.PrimaryHDU:
+            hdu = hdu_type(self.data, header=header)
+        elif self.compression is not None:
+            kwargs = {}
+            if (self.data.dtype.kind == 'f' and
+                    self.compression in ('GZIP_1', 'GZIP_2')):
+                # Without quantization, floats are compressed losslessly
+                kwargs['quantize_level'] = 0.0
+            hdu = fits.CompImageHDU(
+                self.data, header=header, name=self.hdu_name,
+                compression_type=self.compression, **kwargs)
+        else:
+            hdu = hdu_type(self.data, header=header, name=self.hdu_name)
+        if self.index is not None:
+            hdu.ver = self.index + 1
+        return hdu
 
 
-def _get_or_make_hdu(hdulist, hdu_name, index=None, hdu_type=None, value=None):
-    try:
-        hdu = get_hdu(hdulist, hdu_name, index=index)
-    except AttributeError:
-        hdu = _make_hdu(hdulist, hdu_name, index=index, hdu_type=hdu_type,
-                        value=value)
-    else:
-        if hdu_type is not None and not isinstance(hdu, hdu_type):
-            new_hdu = _make_hdu(hdulist, hdu_name, index=index,
-                                hdu_type=hdu_type, value=value)
-            for key, val in six.iteritems(hdu.header):
-                if not _is_builtin_fits_keyword(key):
-                    new_hdu.header[key] = val
-            hdulist.remove(hdu)
-            hdu = new_hdu
-        elif value is not None:
-            hdu.data = value
-    return hdu
+class _HDUCollection(object):
+    """
+    An ordered collection of `_HDUCards`, looked up by HDU name and
+    index.  The primary HDU always comes first.
+
+    The lookups resolve like those of `get_hdu` on an
+    `~astropy.io.fits.HDUList`: no index finds the first HDU of the
+    name, and index 0 also finds an HDU created without an index
+    (whose ``EXTVER`` is implicitly 1).
+    """
+    def __init__(self):
+        self._hdus = OrderedDict()
+        self._first = {}
+        self.get(0)
+
+    def get(self, hdu_name, index=None):
+        if hdu_name in (None, 'PRIMARY'):
+            hdu_name = 0
+        elif hdu_name != 0:
+            hdu_name = fits_hdu_name(hdu_name.upper())
+        cards = self._hdus.get((hdu_name, index))
+        if cards is None:
+            if index is None:
+                cards = self._first.get(hdu_name)
+            elif index == 0:
+                cards = self._hdus.get((hdu_name, None))
+        if cards is None:
+            cards = self._hdus[(hdu_name, index)] = _HDUCards(
+                hdu_name, index)
+            self._first.setdefault(hdu_name, cards)
+        return cards
+
+    def to_hdulist(self):
+        return fits.HDUList(
+            [cards.to_hdu() for cards in six.itervalues(self._hdus)])
 
 
 def _assert_non_primary_hdu(hdu_name):
@@ -198,6 +304,30 @@ def _assert_non_primary_hdu(hdu_name):
 # WRITER
 
 
+def _convert_datetime(node):
+    if isinstance(node, datetime.datetime):
+        node = time.Time(node)
+    if isinstance(node, time.Time):
+        node = six.text_type(time.Time(node, format='iso'))
+    return node
+
+
+def _with_converted_values(validate):
+    # Wraps the validator of a keyword that descends into the values
+    # of an object (``additionalProperties``, ``patternProperties``),
+    # so that it sees their time values converted, as `properties`
+    # does in `_fits_comment_section_handler`.
+    def wrapper(validator, value, instance, schema):
+        if (isinstance(instance, dict) and
+                any(isinstance(x, (datetime.datetime, time.Time))
+                    for x in six.itervalues(instance))):
+            instance = dict(
+                (key, _convert_datetime(x))
+                for key, x in six.iteritems(instance))
+        return validate(validator, value, instance, schema)
+    return wrapper
+
+
 def _fits_comment_section_handler(validator, properties, instance, schema):
     if not validator.is_type(instance, "object"):
         return
@@ -209,8 +339,11 @@ def _fits_comment_section_handler(validator, properties, instance, schema):
 
     for property, subschema in six.iteritems(properties):
         if property in instance:
+            # Time values are converted to strings on the way down, so
+            # that the validators and the keyword writer see the same
+            # value that will end up in the header.
             for error in validator.descend(
-                instance[property],
+                _convert_datetime(instance[property]),
                 subschema,
                 path=property,
                 schema_path=property,
@@ -228,12 +361,9 @@ def _fits_element_writer(validator, fits_keyword, instance, schema):
 
     hdu_name = _get_hdu_name(schema)
     index = getattr(validator, 'sequence_index', None)
-    hdu = _get_or_make_hdu(validator.hdulist, hdu_name, index=index)
+    cards = validator.hdus.get(hdu_name, index=index)
 
-    for comment in validator.comment_stack:
-        hdu.header.append((' ', ''), end=True)
-        hdu.header.append((' ', comment), end=True)
-        hdu.header.append((' ', ''), end=True)
+    cards.add_comment_sections(validator.comment_stack)
     validator.comment_stack = []
 
     comment = util.ensure_ascii(util.get_short_doc(schema))
@@ -241,17 +371,27 @@ def _fits_element_writer(validator, fits_keyword, instance, schema):
 
     if fits_keyword in ('COMMENT', 'HISTORY'):
         for item in instance:
-            hdu.header[fits_keyword] = util.ensure_ascii(item)
-    elif fits_keyword in hdu.header:
-        hdu.header[fits_keyword] = (instance, comment)
+            cards.append(fits_keyword, util.ensure_ascii(item))
     else:
-        hdu.header.append((fits_keyword, instance, comment), end=True)
+        cards.set(fits_keyword, instance, comment)
 
 
 def _fits_array_writer(validator, _, instance, schema):
     if instance is None:
         return
 
+    source = instance
+    if isinstance(instance, properties.DefaultArrayView):
+        # An array that was never written to; it is only allocated
+        # for as long as the HDU list is around.
+        if validator.omit_default_arrays:
+            return
+        materialized = validator.materialized
+        key = id(instance)
+        if key not in materialized:
+            materialized[key] = properties.materialize_default_array(instance)
+        instance = materialized[key]
+
     instance = np.asarray(instance)
 
     if not len(instance.shape):
@@ -271,9 +411,11 @@ def _fits_array_writer(validator, _, instance, schema):
     else:
         hdu_type = fits.ImageHDU
     index = getattr(validator, 'sequence_index', None)
-    hdu = _get_or_make_hdu(validator.hdulist, hdu_name, index=index, hdu_type=hdu_type)
-
-    hdu.data = instance
+    cards = validator.hdus.get(hdu_name, index=index)
+    cards.hdu_type = hdu_type
+    cards.data = instance
+    cards.source = source
+    cards.compression = schema.get('fits_compression')
 
 
 # This is copied from jsonschema._validators and modified to keep track
@@ -283,15 +425,19 @@ def _fits_item_recurse(validator, items, instance, schema):
         return
 
     if validator.is_type(items, "object"):
+        parent_index = getattr(validator, 'sequence_index', None)
         for index, item in enumerate(instance):
             validator.sequence_index = index
-            for error in validator.descend(item, items, path=index):
+            for error in validator.descend(
+                _convert_datetime(item), items, path=index):
                 yield error
+        validator.sequence_index = parent_index
     else:
         # We don't do the index trick on "tuple validated" sequences
         for (index, item), subschema in zip(enumerate(instance), items):
             for error in validator.descend(
-                item, subschema, path=index, schema_path=index,
+                _convert_datetime(item), subschema, path=index,
+                schema_path=index,
             ):
                 yield error
 
@@ -312,6 +458,10 @@ FITS_VALIDATORS.update({
     'datatype': _fits_array_writer,
     'items': _fits_item_recurse,
     'properties': _fits_comment_section_handler,
+    'additionalProperties': _with_converted_values(
+        FITS_VALIDATORS['additionalProperties']),
+    'patternProperties': _with_converted_values(
+        FITS_VALIDATORS['patternProperties']),
     'type': _fits_type
 })
 
@@ -323,61 +473,480 @@ META_SCHEMA_PATH = os.path.abspath(
 FITS_SCHEMA_URL_MAPPING = resolver.Resolver(
     [
         ('http://stsci.edu/schemas/fits-schema/',
+         'file://' + META_SCHEMA_PATH + '/{url_suffix}.yaml'),
+        ('http://stsci.edu/schemas/asdf-storage-schema/',
          'file://' + META_SCHEMA_PATH + '/{url_suffix}.yaml')
     ] + resolver.DEFAULT_URL_MAPPING, 'url')
 
 
-def _save_from_schema(hdulist, tree, schema):
-    def convert_datetimes(node, json_id):
-        if isinstance(node, datetime.datetime):
-            node = time.Time(node)
-        if isinstance(node, time.Time):
-            node = six.text_type(time.Time(node, format='iso'))
-        return node
-    tree = treeutil.walk_and_modify(tree, convert_datetimes)
-
+def _save_from_schema(hdus, tree, schema, omit_default_arrays=False):
     validator = pyasdf_schema.get_validator(
         schema, None, FITS_VALIDATORS, FITS_SCHEMA_URL_MAPPING)
 
-    validator.hdulist = hdulist
+    validator.hdus = hdus
+    validator.omit_default_arrays = omit_default_arrays
+    validator.materialized = {}
     # TODO: Handle comment stack on per-hdu-basis
     validator.comment_stack = []
     # This actually kicks off the saving
     validator.validate(tree, _schema=schema)
 
 
-def _save_extra_fits(hdulist, tree):
+def _save_extra_fits(hdus, tree):
     # Handle _extra_fits
     for hdu_name, parts in six.iteritems(tree.get('extra_fits', {})):
-        hdu_name = fits_hdu_name(hdu_name)
-        hdu = _get_or_make_hdu(hdulist, hdu_name)
+        cards = hdus.get(fits_hdu_name(hdu_name))
         if 'header' in parts:
             for key, val, comment in parts['header']:
                 if _is_builtin_fits_keyword(key):
                     continue
-                hdu.header.append((key, val, comment), end=True)
+                cards.append(key, val, comment)
         if 'data' in parts:
-            hdu.data = parts['data']
+            cards.data = cards.source = parts['data']
+            if (cards.hdu_type is None and
+                    getattr(cards.data, 'dtype', None) is not None and
+                    cards.data.dtype.names is not None):
+                cards.hdu_type = fits.BinTableHDU
 
 
-def _save_history(hdulist, tree):
+def _save_history(hdus, tree):
     history = tree.get('history', [])
+    cards = hdus.get(0)
     for entry in history:
-        hdulist[0].header['HISTORY'] = entry['description']
+        cards.append('HISTORY', entry['description'])
+
+
+def _collect_hdus(tree, schema, omit_default_arrays=False):
+    hdus = _HDUCollection()
+
+    with profiling.phase('save_from_schema'):
+        _save_from_schema(hdus, tree, schema, omit_default_arrays)
+    with profiling.phase('save_extra_fits'):
+        _save_extra_fits(hdus, tree)
+    _save_history(hdus, tree)
 
+    return hdus
 
-def to_fits(tree, schema):
-    hdulist = fits.HDUList()
-    hdulist.append(fits.PrimaryHDU())
 
-    _save_from_schema(hdulist, tree, schema)
-    _save_extra_fits(hdulist, tree)
-    _save_history(hdulist, tree)
+COMPRESSION_TYPES = ('RICE_1', 'GZIP_1', 'GZIP_2', 'PLIO_1', 'HCOMPRESS_1')
 
+
+def _default_compression(dtype):
+    # Integer arrays, such as DQ, compress well and losslessly with
+    # Rice.  Floating-point arrays are only compressed losslessly by
+    # GZIP.
+    if dtype.kind in 'iu' and dtype.itemsize <= 4:
+        return 'RICE_1'
+    return 'GZIP_2'
+
+
+def _resolve_compression(hdus, compression):
+    # Replaces the ``fits_compression`` hints collected from the schema
+    # with the algorithm to use for each HDU, or `None`.
+    if isinstance(compression, dict):
+        overrides = dict(
+            (fits_hdu_name(key.upper()), val)
+            for key, val in six.iteritems(compression))
+    else:
+        overrides = {}
+
+    for cards in six.itervalues(hdus._hdus):
+        hint = cards.compression
+        cards.compression = None
+        if (not compression or
+                cards.hdu_name == 0 or
+                cards.hdu_type not in (None, fits.ImageHDU) or
+                getattr(cards.data, 'dtype', None) is None):
+            continue
+
+        if cards.hdu_name in overrides:
+            algorithm = overrides[cards.hdu_name]
+        elif hint is not None:
+            algorithm = hint
+        else:
+            algorithm = _default_compression(cards.data.dtype)
+
+        if algorithm in (None, 'NONE'):
+            continue
+        if algorithm not in COMPRESSION_TYPES:
+            raise ValueError(
+                "Unknown FITS compression type {0!r}".format(algorithm))
+        cards.compression = algorithm
+
+
+def to_fits(tree, schema, omit_default_arrays=False, compression=False):
+    """
+    Converts a tree to FITS.
+
+    Parameters
+    ----------
+    tree : JSON object tree
+
+    schema : JSON schema
+
+    omit_default_arrays : bool, optional
+        When `True`, the arrays that still hold only their default
+        value (`~jwst_lib.models.properties.DefaultArrayView`) are
+        left out.
+
+    compression : bool or dict, optional
+        When `True`, the image extensions are tile compressed
+        (`~astropy.io.fits.CompImageHDU`), with the algorithm given by
+        the ``fits_compression`` of the array in the schema, or
+        otherwise ``RICE_1`` for integer arrays and lossless
+        ``GZIP_2`` for floating-point ones.  A dict maps HDU names to
+        the algorithm to use for them instead (`None` or ``'NONE'``
+        to leave one uncompressed), and compresses the other HDUs as
+        for `True`.
+
+    Returns
+    -------
+    ff : `pyasdf.fits_embed.AsdfInFits`
+    """
+    hdus = _collect_hdus(tree, schema, omit_default_arrays)
+    _resolve_compression(hdus, compression)
+
+    with profiling.phase('build_hdulist'):
+        hdulist = hdus.to_hdulist()
     asdf = fits_embed.AsdfInFits(hdulist, tree)
     return asdf
 
 
+_structural_regexes = [
+    'SIMPLE', 'XTENSION', 'BITPIX', 'NAXIS[0-9]{0,3}', 'EXTEND', 'PCOUNT',
+    'GCOUNT', 'GROUPS', 'BSCALE', 'BZERO', 'BLANK', 'EXTNAME', 'EXTVER',
+    'TFIELDS', 'THEAP', 'TBCOL[0-9]{1,3}', 'TFORM[0-9]{1,3}',
+    'TTYPE[0-9]{1,3}', 'TUNIT[0-9]{1,3}', 'TSCAL[0-9]{1,3}',
+    'TZERO[0-9]{1,3}', 'TNULL[0-9]{1,3}', 'TDISP[0-9]{1,3}',
+    'TDIM[0-9]{1,3}', 'CHECKSUM', 'DATASUM'
+    ]
+
+
+_structural_regex = re.compile(
+    '|'.join('(^{0}$)'.format(x) for x in _structural_regexes))
+
+
+def _is_structural_keyword(key):
+    """
+    Returns `True` if the given `key` is derived by ``astropy.io.fits``
+    from the data or the name of an HDU, rather than written by the
+    model.
+    """
+    return _structural_regex.match(key) is not None
+
+
+def _model_card_images(header):
+    return [card.image for card in header.cards
+            if not _is_structural_keyword(card.keyword)]
+
+
+def _is_table_hdu(hdu):
+    return (isinstance(hdu, (fits.BinTableHDU, fits.TableHDU)) and
+            not isinstance(hdu, fits.CompImageHDU))
+
+
+def update_fits(hdulist, tree, schema, unchanged, omit_default_arrays=False,
+                compression=False):
+    """
+    Updates a FITS file, opened in ``'update'`` mode, to match the
+    given tree, writing only the headers and arrays that differ from
+    what is already in the file.
+
+    Parameters
+    ----------
+    hdulist : `~astropy.io.fits.HDUList`
+        The file to update, opened with ``mode='update'``.  The
+        changes are written out when it is flushed or closed.
+
+    tree : JSON object tree
+
+    schema : JSON schema
+
+    unchanged : dict
+        Maps ``id(array)`` to each array of the tree that is known to
+        be identical to its HDU in the file.  Those are not written.
+
+    omit_default_arrays, compression : optional
+        See `to_fits`.
+
+    Returns
+    -------
+    updated : bool
+        `False` if the HDUs of the file do not match the ones the tree
+        would be written to, in which case nothing was changed and
+        the whole file must be written instead.
+
+    Notes
+    -----
+    Headers that still fit in their existing FITS blocks, and arrays
+    of the same size as before, are overwritten where they are.  If
+    any of them changed size, ``astropy.io.fits`` rewrites the file
+    as a whole when it is flushed.
+    """
+    hdus = _collect_hdus(tree, schema, omit_default_arrays)
+    _resolve_compression(hdus, compression)
+    all_cards = list(six.itervalues(hdus._hdus))
+
+    with profiling.phase('build_hdulist'):
+        new_hdulist = hdus.to_hdulist()
+    # The ASDF extension goes last, exactly as for a full write
+    ff = fits_embed.AsdfInFits(new_hdulist, tree)
+    ff._update_asdf_extension()
+
+    if len(new_hdulist) != len(hdulist):
+        return False
+    for new_hdu, hdu in zip(new_hdulist, hdulist):
+        if (new_hdu.name != hdu.name or
+                new_hdu.ver != hdu.ver or
+                _is_table_hdu(new_hdu) != _is_table_hdu(hdu) or
+                (isinstance(new_hdu, fits.CompImageHDU) !=
+                 isinstance(hdu, fits.CompImageHDU)) or
+                bool(new_hdu.size) != bool(hdu.size)):
+            return False
+
+    for i, (new_hdu, hdu) in enumerate(zip(new_hdulist, hdulist)):
+        images = _model_card_images(new_hdu.header)
+        if images != _model_card_images(hdu.header):
+            header = hdu.header
+            structural = [card for card in header.cards
+                          if _is_structural_keyword(card.keyword)]
+            header.clear()
+            for card in structural:
+                header.append(card, useblanks=False, end=True)
+            for card in new_hdu.header.cards:
+                if not _is_structural_keyword(card.keyword):
+                    header.append(card, useblanks=False, end=True)
+
+        if i < len(all_cards):
+            cards = all_cards[i]
+            if cards.data is None or id(cards.source) in unchanged:
+                continue
+            hdu.data = new_hdu.data
+        elif new_hdu.data.tostring() != hdu.data.tostring():
+            # The ASDF extension
+            hdu.data = new_hdu.data
+
+    return True
+
+
+##############################################################################
+# HEADERS
+
+
+def _compile_keywords(schema):
+    if 'fits_keyword' in schema:
+        return ('keyword', schema['fits_keyword'], _get_hdu_name(schema),
+                util.ensure_ascii(util.get_short_doc(schema)))
+    elif 'fits_hdu' in schema and (
+            'ndim' in schema or 'max_ndim' in schema or
+            'datatype' in schema):
+        return ('array', _get_hdu_name(schema))
+    elif 'properties' in schema:
+        children = []
+        for key, subschema in six.iteritems(schema['properties']):
+            child = _compile_keywords(subschema)
+            if child is not None:
+                children.append((key, child))
+        if len(children):
+            title = schema.get('title')
+            if title is not None:
+                title = util.ensure_ascii(title)
+            return ('object', title, children)
+    elif isinstance(schema.get('items'), dict):
+        child = _compile_keywords(schema['items'])
+        if child is not None:
+            return ('items', child)
+    return None
+
+
+def compile_keyword_map(schema):
+    """
+    Precomputes the map of FITS keywords defined in a schema.
+
+    The result only contains the parts of the schema that lead to a
+    ``fits_keyword`` or an array, in the order `to_fits` writes them,
+    so that headers can be generated with `get_fits_header` without
+    walking the whole schema (or touching any arrays) each time.
+
+    Parameters
+    ----------
+    schema : JSON schema
+        A flattened schema, as returned by
+        `jwst_lib.models.schema.flatten_combiners`.
+
+    Returns
+    -------
+    keyword_map : opaque object
+    """
+    return _compile_keywords(schema)
+
+
+def _write_keywords(node, instance, comment_stack, write, index=None):
+    # Mirrors what the validator-driven writer in `_save_from_schema`
+    # does for keywords, including where the section comments land.
+    kind = node[0]
+    if kind == 'keyword':
+        _, fits_keyword, hdu_name, comment = node
+        write(hdu_name, index, comment_stack, fits_keyword,
+              _convert_datetime(instance), comment)
+        del comment_stack[:]
+    elif kind == 'object':
+        if not isinstance(instance, dict):
+            return
+        _, title, children = node
+        if title is not None:
+            comment_stack.append(title)
+            depth = len(comment_stack)
+        for key, child in children:
+            if key in instance:
+                _write_keywords(
+                    child, instance[key], comment_stack, write, index)
+        if title is not None and len(comment_stack) == depth:
+            comment_stack.pop(-1)
+    elif kind == 'items':
+        if not isinstance(instance, list):
+            return
+        for i, item in enumerate(instance):
+            _write_keywords(node[1], item, comment_stack, write, i)
+
+
+def _find_array(node, instance, hdu_name, index=None):
+    # Finds the array of the tree that `to_fits` writes to the first
+    # HDU of the given name, without converting it.
+    kind = node[0]
+    if kind == 'array':
+        if (node[1] == hdu_name and not index and
+                isinstance(instance, (np.ndarray, ndarray.NDArrayType))):
+            return instance
+    elif kind == 'object':
+        if isinstance(instance, dict):
+            for key, child in node[2]:
+                if key in instance:
+                    array = _find_array(child, instance[key], hdu_name, index)
+                    if array is not None:
+                        return array
+    elif kind == 'items':
+        if isinstance(instance, list):
+            for i, item in enumerate(instance):
+                array = _find_array(node[1], item, hdu_name, i)
+                if array is not None:
+                    return array
+    return None
+
+
+def get_fits_header(tree, keyword_map, hdu_name='PRIMARY', index=None):
+    """
+    Generates the FITS header that `to_fits` would write for a single
+    HDU, without instantiating any of the HDUs or converting any of
+    the arrays.
+
+    Only the keywords managed by the model are included.  The
+    structural keywords that ``astropy.io.fits`` derives from the data
+    itself (``BITPIX``, ``NAXISn``, ``TFORMn`` etc.) are not.
+
+    Parameters
+    ----------
+    tree : JSON object tree
+        The model's tree.
+
+    keyword_map : opaque object
+        As returned by `compile_keyword_map`.
+
+    hdu_name : str, optional
+        The name of the HDU.  To get the primary HDU, pass
+        ``'PRIMARY'`` (default).
+
+    index : int, optional
+        For HDUs that are repeated (such as the slits of a
+        multi-slit model), the 0-based index of the HDU, i.e.
+        ``EXTVER - 1``.
+
+    Returns
+    -------
+    header : `~astropy.io.fits.Header` object
+    """
+    hdu_name = _get_hdu_name({'fits_hdu': hdu_name})
+    index = index or 0
+    cards = _HDUCards(hdu_name, index)
+
+    def write(kw_hdu_name, kw_index, comment_stack, fits_keyword,
+              instance, comment):
+        if kw_hdu_name != hdu_name or (kw_index or 0) != index:
+            return
+
+        cards.add_comment_sections(comment_stack)
+
+        instance = util.ensure_ascii(instance)
+        if fits_keyword in ('COMMENT', 'HISTORY'):
+            for item in instance:
+                cards.append(fits_keyword, util.ensure_ascii(item))
+        else:
+            cards.set(fits_keyword, instance, comment)
+
+    if keyword_map is not None:
+        _write_keywords(keyword_map, tree, [], write)
+
+    if index == 0:
+        extra_name = 'PRIMARY' if hdu_name == 0 else hdu_name
+        extra_fits = tree.get('extra_fits', {})
+        for extra_hdu_name, parts in six.iteritems(extra_fits):
+            if fits_hdu_name(extra_hdu_name) == extra_name:
+                for key, val, comment in parts.get('header', []):
+                    if not _is_builtin_fits_keyword(key):
+                        cards.append(key, val, comment)
+
+    if hdu_name == 0:
+        for entry in tree.get('history', []):
+            cards.append('HISTORY', entry['description'])
+
+    return cards.to_header()
+
+
+def get_fits_wcs_header(tree, keyword_map, hdu_name='PRIMARY'):
+    """
+    Builds a FITS header containing only the WCS-related keywords
+    that `to_fits` would write to the given HDU, along with the
+    ``NAXIS`` and ``NAXISn`` keywords of the image it would write
+    there, so that the WCS knows the pixel shape.
+
+    Parameters
+    ----------
+    tree : JSON object tree
+        The model's tree.
+
+    keyword_map : opaque object
+        As returned by `compile_keyword_map`.
+
+    hdu_name : str, optional
+        The name of the HDU.  To get the primary HDU, pass
+        ``'PRIMARY'`` (default).
+
+    Returns
+    -------
+    header : `~astropy.io.fits.Header` object
+    """
+    header = get_fits_header(tree, keyword_map, hdu_name)
+    cards = [card for card in header.cards if _is_wcs_keyword(card.keyword)]
+
+    name = _get_hdu_name({'fits_hdu': hdu_name})
+    array = None
+    if keyword_map is not None:
+        array = _find_array(keyword_map, tree, name)
+    if array is None and name != 0:
+        for key, parts in six.iteritems(tree.get('extra_fits', {})):
+            if fits_hdu_name(key) == name:
+                array = parts.get('data')
+    dtype = getattr(array, 'dtype', None)
+    if dtype is not None and dtype.names is None:
+        shape = array.shape
+        naxis = [('NAXIS', len(shape))]
+        for i, size in enumerate(shape[::-1]):
+            naxis.append(('NAXIS{0}'.format(i + 1), size))
+        cards = naxis + cards
+
+    return fits.Header(cards)
+
+
 ##############################################################################
 # READER
 
@@ -521,11 +1090,14 @@ def _load_history(hdulist, tree):
 
 
 def from_fits(hdulist, schema, validate=True):
-    ff = fits_embed.AsdfInFits.open(hdulist)
-
-    known_keywords, known_datas = _load_from_schema(
-        hdulist, schema, ff.tree, validate)
-    _load_extra_fits(hdulist, known_keywords, known_datas, ff.tree)
+    with profiling.phase('asdf_in_fits.open'):
+        ff = fits_embed.AsdfInFits.open(hdulist)
+
+    with profiling.phase('load_from_schema'):
+        known_keywords, known_datas = _load_from_schema(
+            hdulist, schema, ff.tree, validate)
+    with profiling.phase('load_extra_fits'):
+        _load_extra_fits(hdulist, known_keywords, known_datas, ff.tree)
     _load_history(hdulist, ff.tree)
 
     return ff
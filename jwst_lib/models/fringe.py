@@ -29,6 +29,7 @@ class FringeModel(model_base.DataModel):
         The data quality definitions table.
     """
     schema_url = "fringe.schema.yaml"
+    _implicit_arrays = ('dq', 'err')
 
     def __init__(self, init=None, data=None, dq=None, err=None,
                  dq_def=None, **kwargs):
@@ -46,8 +47,5 @@ class FringeModel(model_base.DataModel):
         if dq_def is not None:
             self.dq_def = dq_def
 
-        self.dq = dynamic_mask(self)
-
-        # Implicitly create arrays
-        self.dq = self.dq
-        self.err = self.err
+        if len(self.dq_def):
+            self.dq = dynamic_mask(self)
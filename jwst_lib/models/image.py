@@ -1,12 +1,13 @@
 from __future__ import absolute_import, unicode_literals, division, print_function
 
 from . import model_base
+from .relsens import _RelsensMixin
 
 
 __all__ = ['ImageModel']
 
 
-class ImageModel(model_base.DataModel):
+class ImageModel(_RelsensMixin, model_base.DataModel):
     """
     A data model for 2D images.
 
@@ -28,6 +29,7 @@ class ImageModel(model_base.DataModel):
         The relative sensitivity table.
     """
     schema_url = "image.schema.yaml"
+    _implicit_arrays = ('dq', 'err')
 
     def __init__(self, init=None, data=None, dq=None, err=None, relsens=None,
                  zeroframe=None, area=None, **kwargs):
@@ -50,8 +52,3 @@ class ImageModel(model_base.DataModel):
 
         if area is not None:
             self.area = area
-
-        # Implicitly create arrays
-        self.dq = self.dq
-        self.err = self.err
-        
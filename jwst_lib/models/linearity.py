@@ -26,6 +26,7 @@ class LinearityModel(model_base.DataModel):
         The data quality definitions table.
     """
     schema_url = "linearity.schema.yaml"
+    _implicit_arrays = ('dq',)
 
     def __init__(self, init=None, coeffs=None, dq=None, dq_def=None,
                  **kwargs):
@@ -40,7 +41,5 @@ class LinearityModel(model_base.DataModel):
         if dq_def is not None:
             self.dq_def = dq_def
 
-        self.dq = dynamic_mask(self)
-
-        # Implicitly create arrays
-        self.dq = self.dq
+        if len(self.dq_def):
+            self.dq = dynamic_mask(self)
@@ -22,6 +22,7 @@ class MaskModel(model_base.DataModel):
         The data quality definitions table.
     """
     schema_url = "mask.schema.yaml"
+    _implicit_arrays = ('dq',)
 
     def __init__(self, init=None, dq=None, dq_def=None, **kwargs):
         super(MaskModel, self).__init__(init=init, **kwargs)
@@ -32,12 +33,9 @@ class MaskModel(model_base.DataModel):
         if dq_def is not None:
             self.dq_def = dq_def
 
-        if self.dq is not None or self.dq_def is not None:
+        if len(self.dq_def):
             self.dq = dynamic_mask(self)
 
-        # Implicitly create arrays
-        self.dq = self.dq
-
     def get_primary_array_name(self):
         """
         Returns the name "primary" array for this model, which
@@ -31,6 +31,7 @@ class MIRIRampModel(ramp.RampModel):
         The array of reference output data.
     """
     schema_url = "miri_ramp.schema.yaml"
+    _implicit_arrays = ('pixeldq', 'groupdq', 'err')
 
     def __init__(self, init=None, data=None, pixeldq=None, groupdq=None,
                  err=None, refout=None, zeroframe=None, **kwargs):
@@ -53,8 +54,3 @@ class MIRIRampModel(ramp.RampModel):
 
         if zeroframe is not None:
             self.zeroframe = zeroframe
-            
-        # Implicitly create arrays
-        self.pixeldq = self.pixeldq
-        self.groupdq = self.groupdq
-        self.err = self.err
@@ -20,18 +20,151 @@ from astropy.wcs import WCS
 from pyasdf import AsdfFile
 from pyasdf import yamlutil
 from pyasdf import schema as pyasdf_schema
+from pyasdf.tags.core.ndarray import NDArrayType
 
 from . import fits_support
+from . import profiling
 from . import properties
 from . import schema as mschema
+from . import util
+
+
+def _pickled_array(array):
+    # The default arrays that have never been written to pickle as
+    # their value and shape; see `properties.DefaultArrayView`.
+    if isinstance(array, properties.DefaultArrayView):
+        return array
+    return np.asarray(array)
+
+
+def _rebuild_model(cls, instance, shape, schema):
+    # Unpickles a model; see `DataModel.__reduce__`.
+    return cls._from_tree(instance, schema=schema, shape=shape)
+
+
+# The ASDF block settings accepted by `DataModel.to_asdf`, and the
+# names pyasdf uses for the compression algorithms.
+_ARRAY_STORAGE = ('internal', 'external', 'inline', 'streamed')
+_ARRAY_COMPRESSION = {
+    'none': None, 'zlib': 'zlib', 'bz2': 'bzp2', 'bzp2': 'bzp2', 'lz4': 'lz4'}
+
+
+def _iter_array_schemas(node, schema, path=()):
+    # Yields the dotted path, value and schema of each array in a tree
+    if isinstance(node, (np.ndarray, NDArrayType)):
+        yield '.'.join(path), node, schema
+    elif isinstance(node, dict):
+        for key, val in six.iteritems(node):
+            subschema = properties._get_schema_for_property(schema, key)
+            for x in _iter_array_schemas(val, subschema, path + (key,)):
+                yield x
+    elif isinstance(node, list):
+        for i, val in enumerate(node):
+            subschema = properties._get_schema_for_index(schema, i)
+            for x in _iter_array_schemas(
+                    val, subschema, path + (six.text_type(i),)):
+                yield x
+
+
+def _get_block_option(option, path, schema, hint):
+    # A dict option applies to the arrays it names, a single value to
+    # all of them, and the schema hint to the rest.
+    if isinstance(option, dict):
+        if path in option:
+            return option[path]
+    elif option is not None:
+        return option
+    return schema.get(hint)
+
+
+def _set_block_options(asdf, instance, schema, array_storage,
+                       array_compression):
+    streamed = None
+    for path, array, subschema in _iter_array_schemas(instance, schema):
+        storage = _get_block_option(
+            array_storage, path, subschema, 'asdf_array_storage')
+        compression = _get_block_option(
+            array_compression, path, subschema, 'asdf_compression')
+        if compression is not None:
+            if compression not in _ARRAY_COMPRESSION:
+                raise ValueError(
+                    "Unknown ASDF compression {0!r} for {1!r}".format(
+                        compression, path))
+            compression = _ARRAY_COMPRESSION[compression]
+
+        if storage is not None:
+            if storage not in _ARRAY_STORAGE:
+                raise ValueError(
+                    "Unknown ASDF array storage {0!r} for {1!r}".format(
+                        storage, path))
+            if storage == 'streamed':
+                if streamed is not None:
+                    raise ValueError(
+                        "Only one array can be streamed, got {0!r} and "
+                        "{1!r}".format(streamed, path))
+                if compression is not None:
+                    raise ValueError(
+                        "The streamed array {0!r} can not be "
+                        "compressed".format(path))
+                streamed = path
+            asdf.set_array_storage(array, storage)
+
+        if compression is not None:
+            asdf.set_array_compression(array, compression)
+
+
+def _open_asdf(init):
+    # Opens an ASDF file with its blocks loaded lazily and memory
+    # mapped, where the version of pyasdf lets us choose.  The arrays
+    # stay as `NDArrayType` in the tree until they are accessed; see
+    # `properties._realize_array`.
+    getargspec = getattr(inspect, 'getfullargspec', None)
+    if getargspec is None:
+        getargspec = inspect.getargspec
+    args = getargspec(AsdfFile.open).args
+    kwargs = {}
+    if 'lazy_load' in args:
+        kwargs['lazy_load'] = True
+    if 'copy_arrays' in args:
+        kwargs['copy_arrays'] = False
+    return AsdfFile.open(init, **kwargs)
+
+
+def _record_written(init):
+    if profiling.is_enabled() and isinstance(init, six.string_types):
+        profiling.record_write(os.path.getsize(init))
+
+
+class _ModelType(type):
+    # Records the construction of a model as an 'open' report when
+    # profiling is enabled.  This is done around the whole call, so
+    # that what the constructors of the subclasses do after chaining
+    # up to `DataModel.__init__` (such as `dynamic_mask`) is included.
+    def __call__(cls, *args, **kwargs):
+        if not profiling.is_enabled():
+            return super(_ModelType, cls).__call__(*args, **kwargs)
+        self = cls.__new__(cls)
+        init = args[0] if len(args) else kwargs.get('init')
+        with profiling.report(self, 'open', init):
+            self.__init__(*args, **kwargs)
+        return self
 
 
+@six.add_metaclass(_ModelType)
 class DataModel(properties.ObjectNode):
     """
     Base class of all of the data models.
     """
     schema_url = "core.schema.yaml"
 
+    # The arrays that are always present in the saved files of this
+    # class.  They are only allocated when first used, or on save.
+    _implicit_arrays = ()
+
+    # Set on the models that are shared between callers, such as those
+    # of `refcache`, whose tree must then not be modified.
+    _read_only = False
+
     def __init__(self, init=None, schema=None):
         """
         Parameters
@@ -60,17 +193,15 @@ class DataModel(properties.ObjectNode):
             If not provided, the schema associated with this class
             will be used.
         """
-        filename = os.path.abspath(inspect.getfile(self.__class__))
-        base_url = os.path.join(
-            os.path.dirname(filename), 'schemas', '')
-        if schema is None:
-            schema_path = os.path.join(base_url, self.schema_url)
-            schema = pyasdf_schema.load_schema(
-                schema_path, resolve_references=True)
+        self._init_state()
+        self._default_schema = schema is None
 
-        self._schema = mschema.flatten_combiners(schema)
+        if schema is None:
+            self._schema = self._get_class_schema()
+        else:
+            with profiling.phase('flatten_combiners'):
+                self._schema = mschema.flatten_combiners(schema)
 
-        self._files_to_close = []
         is_array = False
         is_shape = False
         shape = None
@@ -85,6 +216,7 @@ class DataModel(properties.ObjectNode):
         elif isinstance(init, self.__class__):
             instance = copy.deepcopy(init._instance)
             self._schema = init._schema
+            self._default_schema = init._default_schema
             self._shape = init._shape
             self._asdf = AsdfFile(instance)
             self._instance = instance
@@ -110,26 +242,48 @@ class DataModel(properties.ObjectNode):
         elif isinstance(init, six.string_types):
             if isinstance(init, bytes):
                 init = init.decode(sys.getfilesystemencoding())
-            try:
-                hdulist = fits.open(init)
-            except IOError:
-                try:
-                    asdf = AsdfFile.open(init)
-                    # TODO: Add json support
-                except ValueError:
-                    raise IOError(
-                        "File does not appear to be a FITS or ASDF file.")
+            if profiling.is_enabled():
+                profiling.record_read(os.path.getsize(init))
+            file_format, compression = util.sniff_format(init)
+            if file_format == 'asdf':
+                asdf = self._open_asdf_file(init, compression)
             else:
-                asdf = fits_support.from_fits(
-                    hdulist, self._schema, validate=False)
-                self._files_to_close.append(hdulist)
+                # Files that are not recognized (zipped FITS, for
+                # example) are left to the readers to figure out.
+                try:
+                    with profiling.phase('fits.open'):
+                        hdulist = fits.open(init)
+                except IOError:
+                    if file_format == 'fits':
+                        raise
+                    try:
+                        asdf = self._open_asdf_file(init, compression)
+                        # TODO: Add json support
+                    except ValueError:
+                        raise IOError(
+                            "File does not appear to be a FITS or "
+                            "ASDF file.")
+                else:
+                    asdf = fits_support.from_fits(
+                        hdulist, self._schema, validate=False)
+                    self._files_to_close.append(hdulist)
+                    self._source_path = os.path.abspath(init)
+                    self._unchanged_arrays = dict(
+                        (id(x), x) for x in util.iter_arrays(
+                            asdf.tree, (np.ndarray, NDArrayType)))
 
         self._shape = shape
         self._instance = asdf.tree
         self._asdf = asdf
         self._ctx = self
 
-        self.meta.date = Time(datetime.datetime.now())
+        if is_shape or init is None:
+            # Setting the date of a new, empty tree can not make it
+            # invalid, so skip validating the whole tree for it.
+            self._instance.setdefault('meta', {})['date'] = Time(
+                datetime.datetime.now())
+        else:
+            self.meta.date = Time(datetime.datetime.now())
 
         if is_array:
             primary_array_name = self.get_primary_array_name()
@@ -142,6 +296,39 @@ class DataModel(properties.ObjectNode):
         if is_shape:
             getattr(self, self.get_primary_array_name())
 
+    def _init_state(self):
+        # Sets up the state of a new instance that is not part of its
+        # tree, for both `__init__` and `_from_tree`.
+        self._fits_wcs_cache = {}
+        self._keyword_map = None
+        self._schema_memos = None
+        self._profile_reports = []
+        self._files_to_close = []
+        # The FITS file the model was read from, and the arrays of the
+        # tree that have not been handed out or replaced since.
+        self._source_path = None
+        self._unchanged_arrays = {}
+        # The uncompressed ASDF file the arrays are memory mapped from
+        self._asdf_path = None
+
+    def _open_asdf_file(self, path, compression=None):
+        # Compressed files are read through a decompressing file
+        # object, which can not be memory mapped.
+        fd = None
+        if compression is not None:
+            fd = path = util.open_compressed(path, compression)
+        try:
+            with profiling.phase('asdf.open'):
+                asdf = _open_asdf(path)
+        except Exception:
+            if fd is not None:
+                fd.close()
+            raise
+        self._files_to_close.extend([asdf, fd])
+        if fd is None:
+            self._asdf_path = os.path.abspath(path)
+        return asdf
+
     def __enter__(self):
         return self
 
@@ -157,13 +344,117 @@ class DataModel(properties.ObjectNode):
         """
         Returns a deep copy of this model.
         """
+        # The class schema is shared rather than flattened again
+        schema = None if self._default_schema else self._schema
         result = self.__class__(
-            init=copy.deepcopy(self._instance), schema=self._schema)
+            init=copy.deepcopy(self._instance), schema=schema)
         result._shape = self._shape
         return result
 
     __copy__ = __deepcopy__ = copy
 
+    def __reduce__(self):
+        # Only the tree is pickled.  The schema of the class is
+        # reloaded on the other side rather than pickled, unless it
+        # has been changed, and open files are left behind.  The
+        # implicit arrays that have not been created yet stay absent
+        # or default views.  With pickle protocol 5, the arrays in the
+        # tree can be sent as out-of-band buffers.
+        instance = util.map_arrays(
+            self._instance, (np.ndarray, NDArrayType), _pickled_array)
+        schema = None if self._default_schema else self._schema
+        return (_rebuild_model,
+                (self.__class__, instance, self._shape, schema))
+
+    @classmethod
+    def _load_schema(cls):
+        # Loads the schema associated with this class, from the
+        # schemas directory next to the module defining it.
+        filename = os.path.abspath(inspect.getfile(cls))
+        base_url = os.path.join(
+            os.path.dirname(filename), 'schemas', '')
+        schema_path = os.path.join(base_url, cls.schema_url)
+        with profiling.phase('load_schema'):
+            return pyasdf_schema.load_schema(
+                schema_path, resolve_references=True)
+
+    @classmethod
+    def _get_class_schema(cls):
+        # The flattened schema of each class is loaded the first time
+        # it is needed, and then shared by all of its instances.  It
+        # must not be modified in place.
+        schema = cls.__dict__.get('_class_schema')
+        if schema is None:
+            schema = cls._load_schema()
+            with profiling.phase('flatten_combiners'):
+                schema = mschema.flatten_combiners(schema)
+            cls._class_schema = schema
+        return schema
+
+    @classmethod
+    def _from_tree(cls, instance, schema=None, shape=None):
+        """
+        Create a model of this class around an existing tree, without
+        running the constructors, which would otherwise reset
+        ``meta.date`` and re-apply things like `dynamic_mask` to
+        content that has already been through them.
+
+        Parameters
+        ----------
+        instance : dict
+            The tree of the model.  It is used as-is, not copied.
+
+        schema : flattened schema tree, optional
+            If not provided, the schema associated with this class
+            will be used.
+
+        shape : tuple, optional
+        """
+        self = cls.__new__(cls)
+        self._init_state()
+        self._default_schema = schema is None
+        if schema is None:
+            schema = cls._get_class_schema()
+        self._schema = schema
+        self._shape = shape
+        self._instance = instance
+        self._asdf = AsdfFile(instance)
+        self._ctx = self
+        return self
+
+    def _make_implicit_arrays(self, views=False):
+        # With views=True, the arrays that have not been created yet
+        # are stored as read-only views of their default value, which
+        # cost no memory until they are accessed.
+        if views:
+            self._instance.update(self._get_implicit_views())
+        else:
+            for name in self._implicit_arrays:
+                getattr(self, name)
+
+    def _get_implicit_views(self):
+        # Returns the default views of the implicit arrays that have
+        # not been created yet, by name.
+        views = {}
+        for name in self._implicit_arrays:
+            if name not in self._instance:
+                schema = properties._get_schema_for_property(
+                    self._schema, name, self._get_schema_memo('properties'))
+                views[name] = properties._make_default_array(
+                    name, schema, self, view=True)
+        return views
+
+    def _get_tree_to_save(self):
+        # The tree with all of the implicit arrays, as default views
+        # where they have not been created yet.  The tree of the model
+        # itself is left as it is.
+        views = self._get_implicit_views()
+        if not views:
+            return self._instance
+        instance = copy.copy(self._instance)
+        instance.update(views)
+        return instance
+
     def get_primary_array_name(self):
         """
         Returns the name "primary" array for this model, which
@@ -194,6 +485,8 @@ class DataModel(properties.ObjectNode):
     def save(self, path, *args, **kwargs):
         """
         Save to either a FITS or ASDF file, depending on the path.
+        Paths ending in ``.fits.gz`` are written as gzip-compressed
+        FITS.
 
         Parameters
         ----------
@@ -201,10 +494,12 @@ class DataModel(properties.ObjectNode):
         """
         base, ext = os.path.splitext(path)
         if isinstance(ext, bytes):
+            base = base.decode(sys.getfilesystemencoding())
             ext = ext.decode(sys.getfilesystemencoding())
+        if ext == '.gz':
+            ext = os.path.splitext(base)[1] + ext
 
-        # TODO: Support gzip-compressed fits
-        if ext == '.fits':
+        if ext in ('.fits', '.fits.gz'):
             kwargs.setdefault('clobber', True)
             self.to_fits(path, *args, **kwargs)
         elif ext == '.asdf':
@@ -234,6 +529,7 @@ class DataModel(properties.ObjectNode):
         """
         return cls(init, schema=schema)
 
+    @profiling.reported('save')
     def to_asdf(self, init, *args, **kwargs):
         """
         Write a DataModel to a ASDF file.
@@ -242,13 +538,47 @@ class DataModel(properties.ObjectNode):
         ----------
         init : file path or file object
 
+        array_storage : str or dict, optional
+            Where to store the arrays: ``'internal'`` (binary blocks
+            at the end of the file, the default), ``'inline'`` (as
+            YAML), ``'external'`` (in separate files next to it) or
+            ``'streamed'``.  A single value applies to every array; a
+            dict maps the dotted paths of arrays (such as ``'data'``
+            or ``'slits.0.data'``) to the storage of each.  Arrays
+            that are not given use the ``asdf_array_storage`` of
+            their schema, if any (see
+            ``metaschema/asdf-storage-schema.yaml``).
+
+            Only one array can be ``'streamed'``.  It is written as
+            the last block of the file, without a size, so that more
+            rows can be appended to the file afterwards.
+
+        array_compression : str or dict, optional
+            The compression of the binary blocks: ``'zlib'``,
+            ``'bz2'``, ``'lz4'`` or ``'none'``, given in the same way
+            as *array_storage*.  The schema hint is
+            ``asdf_compression``.
+
         *args, **kwargs
             Any additional arguments are passed along to
             `pyasdf.AsdfFile.write_to`.
         """
+        array_storage = kwargs.pop('array_storage', None)
+        array_compression = kwargs.pop('array_compression', None)
+
         self.on_save(init)
 
-        AsdfFile(self._instance).write_to(init, *args, **kwargs)
+        # The default views are written out as regular arrays
+        instance = util.map_arrays(
+            self._get_tree_to_save(), properties.DefaultArrayView,
+            properties.materialize_default_array)
+        asdf = AsdfFile(instance)
+        _set_block_options(
+            asdf, instance, self._schema, array_storage,
+            array_compression)
+        with profiling.phase('write'):
+            asdf.write_to(init, *args, **kwargs)
+        _record_written(init)
 
     @classmethod
     def from_fits(cls, init, schema=None):
@@ -272,6 +602,7 @@ class DataModel(properties.ObjectNode):
         """
         return cls(init, schema=schema)
 
+    @profiling.reported('save')
     def to_fits(self, init, *args, **kwargs):
         """
         Write a DataModel to a FITS file.
@@ -280,20 +611,91 @@ class DataModel(properties.ObjectNode):
         ----------
         init : file path or file object
 
+        default_arrays : str, optional
+            What to do with the arrays that have never been written
+            to and still hold only their default value: ``'write'``
+            (default) writes them out like any other array, and
+            ``'omit'`` leaves them out of the file.  The model reads
+            omitted arrays back as their default value.
+
+        compression : bool or dict, optional
+            Tile compress the image extensions.  `True` uses the
+            ``fits_compression`` of each array in the schema, or else
+            lossless ``RICE_1`` for integer arrays (such as DQ) and
+            lossless ``GZIP_2`` for floating-point arrays.  A dict
+            maps HDU names to the algorithm to use for them, or
+            `None` to leave them uncompressed.  See
+            `jwst_lib.models.fits_support.to_fits`.
+
+        update_in_place : bool, optional
+            When *init* is the FITS file the model was read from,
+            rewrite only the headers and arrays that have changed,
+            rather than the whole file.  An array counts as changed
+            once it has been accessed as an attribute of the model,
+            since it may have been modified in place.  The whole file
+            is written when its HDUs no longer match the model, and
+            also (by ``astropy.io.fits``) when any header or array
+            changed size.
+
         *args, **kwargs
             Any additional arguments are passed along to
             `astropy.io.fits.writeto`.
         """
+        update_in_place = kwargs.pop('update_in_place', False)
+        compression = kwargs.pop('compression', False)
+        default_arrays = kwargs.pop('default_arrays', 'write')
+        if default_arrays not in ('write', 'omit'):
+            raise ValueError(
+                "default_arrays must be 'write' or 'omit', got {0!r}".format(
+                    default_arrays))
+
         self.on_save(init)
+        instance = self._get_tree_to_save()
+
+        if update_in_place and self._is_source_file(init):
+            with profiling.phase('update_in_place'):
+                with fits.open(init, mode='update') as hdulist:
+                    updated = fits_support.update_fits(
+                        hdulist, instance, self._schema,
+                        self._unchanged_arrays,
+                        omit_default_arrays=(default_arrays == 'omit'),
+                        compression=compression)
+            if updated:
+                return
+
+        with profiling.phase('to_fits'):
+            ff = fits_support.to_fits(
+                instance, self._schema,
+                omit_default_arrays=(default_arrays == 'omit'),
+                compression=compression)
+        with ff:
+            with profiling.phase('write'):
+                ff.write_to(init, *args, **kwargs)
+        _record_written(init)
+
+    def _is_source_file(self, init):
+        # A gzipped file can not be updated in place
+        return (self._source_path is not None and
+                isinstance(init, six.string_types) and
+                not init.endswith('.gz') and
+                os.path.exists(init) and
+                os.path.samefile(init, self._source_path))
 
-        with fits_support.to_fits(self._instance, self._schema) as ff:
-            ff.write_to(init, *args, **kwargs)
+    @property
+    def profile_reports(self):
+        """
+        The `~jwst_lib.models.profiling.Report` objects recorded for
+        each open and save of this model while instrumentation was
+        enabled.  See `jwst_lib.models.profiling`.
+        """
+        return list(self._profile_reports)
 
     @property
     def shape(self):
         if self._shape is None:
-            if self.get_primary_array_name() in self._instance:
-                return getattr(self, self.get_primary_array_name()).shape
+            primary_array_name = self.get_primary_array_name()
+            if primary_array_name in self._instance:
+                return self._instance[primary_array_name].shape
             else:
                 return None
         return self._shape
@@ -304,6 +706,17 @@ class DataModel(properties.ObjectNode):
         else:
             super(DataModel, self).__setattr__(attr, value)
 
+    def validate(self):
+        """
+        Validates the whole model against its schema.  The validator
+        is created once for each schema and reused.
+
+        Raises
+        ------
+        jsonschema.ValidationError
+        """
+        self._validate()
+
     def extend_schema(self, new_schema):
         """
         Extend the model's schema using the given schema, by combining
@@ -313,8 +726,12 @@ class DataModel(properties.ObjectNode):
         ----------
         new_schema : schema tree
         """
+        self._check_writable()
         schema = {'allOf': [self._schema, new_schema]}
         self._schema = mschema.flatten_combiners(schema)
+        self._default_schema = False
+        self._keyword_map = None
+        self._schema_memos = None
         self._validate()
         return self
 
@@ -459,6 +876,8 @@ class DataModel(properties.ObjectNode):
                     for x in recurse(val, path + [i]):
                         yield x
             elif tree is not None:
+                if isinstance(tree, (np.ndarray, NDArrayType)):
+                    self._array_accessed(tree)
                 yield ('.'.join(six.text_type(x) for x in path), tree)
 
         for x in recurse(self._instance):
@@ -587,12 +1006,80 @@ class DataModel(properties.ObjectNode):
 
     @property
     def history(self):
+        if self._read_only:
+            return tuple(self._instance.get('history', ()))
         return self._instance.setdefault('history', [])
 
     @history.setter
     def history(self, v):
+        self._check_writable()
         self._instance['history'] = v
 
+    def _get_keyword_map(self):
+        if self._keyword_map is None:
+            if self._default_schema:
+                # Shared by all of the instances using the class schema
+                cls = self.__class__
+                keyword_map = cls.__dict__.get('_class_keyword_map')
+                if keyword_map is None:
+                    keyword_map = fits_support.compile_keyword_map(
+                        self._schema)
+                    cls._class_keyword_map = keyword_map
+                self._keyword_map = keyword_map
+            else:
+                self._keyword_map = fits_support.compile_keyword_map(
+                    self._schema)
+        return self._keyword_map
+
+    def _get_schema_memo(self, name):
+        # Returns a dict in which to keep results derived from the
+        # parts of the schema of this model, by their id.  The dicts
+        # live only as long as the schema: they are shared by all of
+        # the instances using the class schema, and otherwise kept on
+        # the instance.
+        if self._schema_memos is None:
+            if self._default_schema:
+                cls = self.__class__
+                memos = cls.__dict__.get('_class_schema_memos')
+                if memos is None:
+                    memos = cls._class_schema_memos = {}
+                self._schema_memos = memos
+            else:
+                self._schema_memos = {}
+        memo = self._schema_memos.get(name)
+        if memo is None:
+            memo = self._schema_memos.setdefault(name, {})
+        return memo
+
+    def get_fits_header(self, hdu_name='PRIMARY', index=None):
+        """
+        Get the `astropy.io.fits.Header` that would be written for the
+        given HDU when saving this model to FITS.
+
+        This is much cheaper than going through `to_fits`, since only
+        the keywords of the requested HDU are generated and none of
+        the arrays are touched.  As a consequence, the structural
+        keywords (``BITPIX``, ``NAXISn`` etc.) are not included.
+
+        Parameters
+        ----------
+        hdu_name : str, optional
+            The name of the HDU to get the header for.  This must use
+            named HDU's, not numerical order HDUs.  To get the primary
+            HDU, pass ``'PRIMARY'`` (default).
+
+        index : int, optional
+            For repeated HDUs, such as the slits of a
+            `~jwst_lib.models.MultiSlitModel`, the 0-based index of
+            the HDU.
+
+        Returns
+        -------
+        header : `astropy.io.fits.Header` object
+        """
+        return fits_support.get_fits_header(
+            self._instance, self._get_keyword_map(), hdu_name, index=index)
+
     def get_fits_wcs(self, hdu_name='PRIMARY', key=' '):
         """
         Get a `astropy.wcs.WCS` object created from the FITS WCS
@@ -601,6 +1088,10 @@ class DataModel(properties.ObjectNode):
         Note that modifying the returned WCS object will not modify
         the data in this model.  To update the model, use `set_fits_wcs`.
 
+        Only the WCS-related keywords (and the shape of the HDU's
+        image) are used to build the WCS, and the result is cached
+        for as long as those keywords are unchanged.
+
         Parameters
         ----------
         hdu_name : str, optional
@@ -620,11 +1111,20 @@ class DataModel(properties.ObjectNode):
             The type will depend on what libraries are installed on
             this system.
         """
-        ff = fits_support.to_fits(self._instance, self._schema)
-        hdu = fits_support.get_hdu(ff._hdulist, hdu_name)
-        header = hdu.header
-
-        return WCS(header, key=key, relax=True, fix=True)
+        # Building the header is cheap compared to parsing it into a
+        # WCS, and catches every change to the tree, including the ones
+        # made without going through the model's attributes.
+        header = fits_support.get_fits_wcs_header(
+            self._instance, self._get_keyword_map(), hdu_name)
+        cache_key = (hdu_name, key)
+        signature = header.tostring()
+        cached_signature, wcs = self._fits_wcs_cache.get(
+            cache_key, (None, None))
+        if cached_signature != signature:
+            wcs = WCS(header, key=key, relax=True, fix=True)
+            self._fits_wcs_cache[cache_key] = (signature, wcs)
+
+        return copy.deepcopy(wcs)
 
     def set_fits_wcs(self, wcs, hdu_name='PRIMARY'):
         """
@@ -644,6 +1144,7 @@ class DataModel(properties.ObjectNode):
             named HDU's, not numerical order HDUs.  To set the primary
             HDU, pass ``'PRIMARY'`` (default).
         """
+        self._check_writable()
         header = wcs.to_header()
         if hdu_name == 'PRIMARY':
             hdu = fits.PrimaryHDU(header=header)
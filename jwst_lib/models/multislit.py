@@ -2,12 +2,13 @@ from __future__ import absolute_import, unicode_literals, division, print_functi
 
 from . import model_base
 from .image import ImageModel
+from .relsens import _RelsensMixin
 
 
 __all__ = ['MultiSlitModel']
 
 
-class MultiSlitModel(model_base.DataModel):
+class MultiSlitModel(_RelsensMixin, model_base.DataModel):
     """
     A data model for multi-slit images.
 
@@ -44,3 +45,30 @@ class MultiSlitModel(model_base.DataModel):
             return
 
         super(MultiSlitModel, self).__init__(init=init, **kwargs)
+
+    def interpolate_relsens(self, wavelength):
+        """
+        Interpolate the relative sensitivity tables of all of the slits
+        at once.
+
+        The tables are sorted and packed into a single grid the first
+        time this is called, and the grid is kept for as long as the
+        ``relsens`` tables of the slits are the same arrays.
+
+        Parameters
+        ----------
+        wavelength : scalar, 1-D or 2-D array
+            The wavelengths at which to evaluate the response.  A
+            scalar or 1-D array is used for every slit; a 2-D array
+            gives the wavelengths for each slit.
+
+        Returns
+        -------
+        response : array
+            Of shape ``(nslits,)`` for a scalar *wavelength*, and
+            otherwise ``(nslits, n)``.
+        """
+        return self._get_relsens_interpolator()(wavelength)
+
+    def _get_relsens_tables(self):
+        return [slit.relsens for slit in self.slits]
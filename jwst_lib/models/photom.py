@@ -1,11 +1,148 @@
 from __future__ import absolute_import, unicode_literals, division, print_function
 
+from astropy.extern import six
+
 from . import model_base
+from . import util
 
 __all__ = ['PhotomModel']
 
 
-class PhotomModel(model_base.DataModel):
+def _normalize_key(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, bytes):
+        value = value.decode('ascii')
+    if isinstance(value, six.string_types):
+        value = value.strip()
+    return value
+
+
+class _PhotomLookupMixin(object):
+    """
+    Adds indexed row selection and response interpolation on
+    ``phot_table`` to the photom models.
+    """
+    def _get_phot_index(self, table, columns):
+        # One index is kept for each combination of selection columns,
+        # for as long as phot_table is the same array.
+        for name in columns:
+            if name not in table.dtype.names:
+                raise ValueError(
+                    "phot_table has no column {0!r}".format(name))
+
+        def make_index():
+            values = [[_normalize_key(x) for x in table[name].tolist()]
+                      for name in columns]
+            index = {}
+            for i, key in enumerate(zip(*values)):
+                index.setdefault(key, i)
+            return index
+
+        return util.get_cached(
+            self, ('phot_index', columns), [table], make_index)
+
+    def _get_response_column(self, table):
+        for name in ('relresponse', 'response'):
+            if name in table.dtype.names:
+                return name
+        return None
+
+    def lookup(self, **selection):
+        """
+        Find the row of ``phot_table`` matching the given selection.
+
+        The first lookup on a given set of columns builds an index of
+        the table on those columns, so that each lookup is a single
+        hash lookup rather than a scan of the table.  The indexes are
+        kept for the life of the model, or until ``phot_table`` is
+        replaced.
+
+        Parameters
+        ----------
+        **selection : column=value
+            The values of the selection columns, for example
+            ``filter='F090W', pupil='CLEAR'``.  Strings are compared
+            without any surrounding whitespace.
+
+        Returns
+        -------
+        row : numpy.void
+            The first matching row of ``phot_table``.
+
+        wavelength, response : 1-D arrays
+            The ``wavelength`` and ``response`` (or ``relresponse``)
+            vectors of the row, trimmed to its ``nelem`` elements.
+            ``response`` is `None` if the table has no such column.
+
+        Raises
+        ------
+        KeyError
+            No row matches the selection.
+        """
+        if not selection:
+            raise TypeError("lookup requires at least one selection column")
+
+        table = self.phot_table
+        columns = tuple(sorted(selection))
+        index = self._get_phot_index(table, columns)
+        key = tuple(_normalize_key(selection[name]) for name in columns)
+        try:
+            row = table[index[key]]
+        except KeyError:
+            raise KeyError("No row of phot_table matches {0}".format(
+                ', '.join('{0}={1!r}'.format(name, selection[name])
+                          for name in columns)))
+
+        nelem = int(row['nelem'])
+        wavelength = row['wavelength'][:nelem]
+        response = None
+        name = self._get_response_column(table)
+        if name is not None:
+            response = row[name][:nelem]
+
+        return row, wavelength, response
+
+    def interpolate_response(self, wavelength, rows=None):
+        """
+        Interpolate the response curves of many rows of ``phot_table``
+        at once.
+
+        The curves are sorted and packed into a single grid the first
+        time this is called, and the grid is kept for as long as
+        ``phot_table`` is the same array.
+
+        Parameters
+        ----------
+        wavelength : scalar, 1-D or 2-D array
+            The wavelengths at which to evaluate the response.  A
+            scalar or 1-D array is used for every row; a 2-D array
+            gives the wavelengths for each row.
+
+        rows : 1-D int array, optional
+            The rows of ``phot_table`` to evaluate, for example as
+            found with `lookup`.  By default, all rows are evaluated.
+
+        Returns
+        -------
+        response : array
+            Of shape ``(nrows,)`` for a scalar *wavelength*, and
+            otherwise ``(nrows, n)``.  Wavelengths outside of a curve
+            take the response at its nearest end.
+        """
+        table = self.phot_table
+        name = self._get_response_column(table)
+        if name is None:
+            raise ValueError("phot_table has no response column")
+
+        interpolator = util.get_cached(
+            self, 'phot_interpolator', [table],
+            lambda: util.RowInterpolator(
+                table['wavelength'], table[name], table['nelem']))
+        return interpolator(wavelength, rows=rows)
+
+
+class PhotomModel(_PhotomLookupMixin, model_base.DataModel):
     """
     A base class for photometric reference file models.
     """
@@ -1,11 +1,12 @@
 from __future__ import absolute_import, unicode_literals, division, print_function
 
 from . import model_base
+from .photom import _PhotomLookupMixin
 
 __all__ = ['PhotomModelB4']
 
 
-class PhotomModelB4(model_base.DataModel):
+class PhotomModelB4(_PhotomLookupMixin, model_base.DataModel):
     """
     A data model for photom reference files.
     """
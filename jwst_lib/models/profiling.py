@@ -0,0 +1,337 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""
+Opt-in instrumentation of model I/O.
+
+When enabled, every time a model is opened or saved a `Report` is
+recorded with the wall time spent in each phase (loading the schema,
+parsing the FITS file, converting it to the tree, validation, etc.),
+the number of bytes read and written and the arrays allocated along
+the way.  The reports of a model are available from
+`DataModel.profile_reports`.
+
+Instrumentation is disabled by default, and costs only a flag check
+per phase while disabled.  It can be enabled for the whole process
+by setting the ``JWST_MODELS_PROFILE`` environment variable to a true
+value (such as ``1`` or ``yes``), or for a block of code with
+`profile`::
+
+    from jwst_lib.models import profiling
+
+    with profiling.profile() as reports:
+        with ImageModel('image.fits') as model:
+            model.save('output.fits')
+
+    for report in reports:
+        print(report)
+"""
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import functools
+import os
+import threading
+import time
+
+from astropy.extern import six
+from astropy.utils.compat.odict import OrderedDict
+
+
+__all__ = ['Report', 'profile', 'enable', 'disable', 'is_enabled']
+
+
+def _parse_flag(value):
+    return value.strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+
+_enabled = _parse_flag(os.environ.get('JWST_MODELS_PROFILE', ''))
+_local = threading.local()
+# The number of `profile` blocks currently running, in any thread, and
+# the report lists they collect into.  Both are guarded by `_lock`.
+_active = 0
+_collectors = []
+_lock = threading.Lock()
+
+
+def enable():
+    """
+    Enable instrumentation for the whole process.
+    """
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """
+    Disable instrumentation for the whole process.  Running `profile`
+    blocks still record.
+    """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    """
+    Returns `True` if instrumentation is currently enabled, either
+    for the whole process or by a running `profile` block.
+    """
+    return _enabled or _active > 0
+
+
+class Report(object):
+    """
+    Timing and I/O statistics for a single open or save of a model.
+
+    Phase times are inclusive: a phase that runs inside another phase
+    is counted in both.
+
+    Where the operating system reports it (Linux), ``bytes_read`` is
+    the number of bytes the thread actually read while the report was
+    in progress.  The parts of a file that are memory mapped are only
+    read when they are accessed, so they are not counted.  Elsewhere,
+    it is the size of the file that was opened.
+    """
+    def __init__(self, operation, target=None):
+        self.operation = operation
+        self.target = target
+        self.total_time = 0.0
+        self.phases = OrderedDict()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.arrays_allocated = 0
+        self.bytes_allocated = 0
+
+    def add_phase(self, name, elapsed):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = {'time': 0.0, 'calls': 0}
+        phase['time'] += elapsed
+        phase['calls'] += 1
+
+    def as_dict(self):
+        """
+        Returns the report as a dictionary of basic Python types.
+        """
+        return {
+            'operation': self.operation,
+            'target': self.target,
+            'total_time': self.total_time,
+            'phases': dict(
+                (name, dict(phase)) for name, phase in
+                six.iteritems(self.phases)),
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'arrays_allocated': self.arrays_allocated,
+            'bytes_allocated': self.bytes_allocated
+        }
+
+    def __repr__(self):
+        lines = ['{0} {1}: {2:.6f} s'.format(
+            self.operation, self.target, self.total_time)]
+        for name, phase in six.iteritems(self.phases):
+            lines.append('    {0:<24} {1:>10.6f} s  {2:>6} calls'.format(
+                name, phase['time'], phase['calls']))
+        lines.append('    bytes read: {0}, bytes written: {1}'.format(
+            self.bytes_read, self.bytes_written))
+        lines.append('    arrays allocated: {0} ({1} bytes)'.format(
+            self.arrays_allocated, self.bytes_allocated))
+        return '\n'.join(lines)
+
+
+def _get_stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        stack = _local.stack = []
+        return stack
+
+
+def current_report():
+    """
+    Returns the `Report` of the open or save currently in progress
+    in this thread, or `None`.
+    """
+    if not is_enabled():
+        return None
+    stack = _get_stack()
+    if len(stack):
+        return stack[-1]
+    return None
+
+
+class _NullContext(object):
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_null_context = _NullContext()
+
+
+class _Phase(object):
+    def __init__(self, report, name):
+        self._report = report
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.time()
+        return self._report
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._report.add_phase(self._name, time.time() - self._start)
+        return False
+
+
+def phase(name):
+    """
+    Returns a context manager that records the time spent in the
+    block as the phase *name* of the current report.  Does nothing
+    when instrumentation is disabled or no report is in progress.
+    """
+    if not is_enabled():
+        return _null_context
+    report = current_report()
+    if report is None:
+        return _null_context
+    return _Phase(report, name)
+
+
+_IO_STATS = '/proc/thread-self/io'
+
+
+def _read_count():
+    # Returns the number of bytes read by this thread so far, and the
+    # number read to find that out, or `None` where it is not
+    # available.
+    try:
+        with open(_IO_STATS, 'rb') as fd:
+            content = fd.read()
+    except (IOError, OSError):
+        return None
+    for line in content.splitlines():
+        if line.startswith(b'rchar:'):
+            return int(line.split()[1]), len(content)
+    return None
+
+
+class _ReportContext(object):
+    def __init__(self, model, operation, target):
+        self._model = model
+        if not isinstance(target, six.string_types):
+            target = type(target).__name__
+        self._report = Report(operation, target)
+
+    def __enter__(self):
+        _get_stack().append(self._report)
+        self._read_count = _read_count()
+        self._start = time.time()
+        return self._report
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        report = self._report
+        report.total_time = time.time() - self._start
+        end = _read_count()
+        if self._read_count is not None and end is not None:
+            start, consumed = self._read_count
+            report.bytes_read = end[0] - start - consumed
+        _get_stack().pop()
+        # The model may not have been set up if its constructor failed
+        self._model.__dict__.setdefault('_profile_reports', []).append(
+            report)
+        with _lock:
+            collectors = list(_collectors)
+        for collector in collectors:
+            collector.append(report)
+        return False
+
+
+def report(model, operation, target=None):
+    """
+    Returns a context manager that records a new `Report` for the
+    given model while the block runs.  Does nothing when
+    instrumentation is disabled.
+
+    Parameters
+    ----------
+    model : DataModel instance
+
+    operation : str
+        ``'open'`` or ``'save'``
+
+    target : str or object, optional
+        The path being read or written.
+    """
+    if not is_enabled():
+        return _null_context
+    return _ReportContext(model, operation, target)
+
+
+def reported(operation):
+    """
+    Decorator for the methods of a model that take the path being
+    read or written as their first argument.  Each call records a
+    new `Report`, as with `report`.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, target, *args, **kwargs):
+            with report(self, operation, target):
+                return method(self, target, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_read(nbytes):
+    """
+    Adds *nbytes* to the bytes read by the current report.  This is
+    overridden by the count of the bytes actually read, where it is
+    available.
+    """
+    report = current_report()
+    if report is not None:
+        report.bytes_read += nbytes
+
+
+def record_write(nbytes):
+    """
+    Adds *nbytes* to the bytes written by the current report.
+    """
+    report = current_report()
+    if report is not None:
+        report.bytes_written += nbytes
+
+
+def record_allocation(array):
+    """
+    Records the allocation of *array* in the current report.
+    """
+    report = current_report()
+    if report is not None:
+        report.arrays_allocated += 1
+        report.bytes_allocated += array.nbytes
+
+
+class profile(object):
+    """
+    Context manager that enables instrumentation for the duration of
+    the block.  It returns a list which collects the reports of all
+    of the opens and saves made during the block, in any model.
+
+    Blocks may overlap, for example one per worker thread;
+    instrumentation stays enabled until the last of them exits.
+    """
+    def __enter__(self):
+        global _active
+        self._reports = []
+        with _lock:
+            _active += 1
+            _collectors.append(self._reports)
+        return self._reports
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _active
+        with _lock:
+            _collectors.remove(self._reports)
+            _active -= 1
+        return False
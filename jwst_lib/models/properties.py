@@ -4,6 +4,8 @@
 from __future__ import absolute_import, division, unicode_literals, print_function
 
 import copy
+import mmap
+import os
 
 import numpy as np
 
@@ -17,6 +19,7 @@ from pyasdf import schema
 from pyasdf import yamlutil
 from pyasdf.tags.core import ndarray
 
+from . import profiling
 from . import util
 
 
@@ -40,7 +43,106 @@ def _cast(val, schema):
     return val
 
 
-def _make_default_array(attr, schema, ctx):
+class DefaultArrayView(np.ndarray):
+    """
+    A read-only view of a constant default value, broadcast to the
+    shape of an array that has never been written to.  It is stored
+    in the tree in place of the full array, and replaced by a real
+    array (see `materialize_default_array`) when the attribute is
+    accessed.
+    """
+    def _is_constant(self):
+        # False for the results of arithmetic on a view, for example
+        return not any(self.strides)
+
+    def _get_value(self):
+        if self.size:
+            return np.array(self[(0,) * self.ndim])
+        return np.zeros((), dtype=self.dtype)
+
+    def __reduce__(self):
+        # Pickled as its value and shape, rather than at full size
+        if not self._is_constant():
+            return np.ndarray.__reduce__(self)
+        return (_make_default_view,
+                (self.shape, self.dtype, self._get_value()))
+
+    def __deepcopy__(self, memo):
+        # Copied as another view, rather than as a full, writable array
+        if not self._is_constant():
+            return np.ndarray.__deepcopy__(self, memo)
+        return _make_default_view(self.shape, self.dtype, self._get_value())
+
+    def __copy__(self):
+        return self.__deepcopy__({})
+
+
+def _make_default_view(shape, dtype, default):
+    if default is None:
+        default = 0
+    value = np.array(default, dtype=dtype).view(DefaultArrayView)
+    return np.broadcast_to(value, shape, subok=True)
+
+
+def materialize_default_array(view):
+    """
+    Returns a new, writable array with the same content as a
+    `DefaultArrayView`.
+    """
+    array = np.zeros(view.shape, dtype=view.dtype)
+    if view.size:
+        value = view[(0,) * view.ndim]
+        if value != 0:
+            array[...] = value
+    profiling.record_allocation(array)
+    return array
+
+
+def _map_copy_on_write(array, path):
+    # Returns a copy-on-write mapping of the part of the file at *path*
+    # that the read-only memory mapped *array* refers to, or `None` if
+    # that can not be determined.
+    if (path is None or not array.nbytes or
+            not (array.flags.c_contiguous or array.flags.f_contiguous)):
+        return None
+    base = array
+    while isinstance(base, np.ndarray):
+        base = base.base
+    # Only a mapping of the whole file gives the offsets in the file
+    if not isinstance(base, mmap.mmap) or len(base) != os.path.getsize(path):
+        return None
+    start = np.frombuffer(base, dtype=np.uint8).__array_interface__['data'][0]
+    offset = array.__array_interface__['data'][0] - start
+
+    mapped = np.memmap(
+        path, dtype=np.uint8, mode='c', offset=offset,
+        shape=(array.nbytes,))
+    order = 'C' if array.flags.c_contiguous else 'F'
+    return mapped.view(np.ndarray).view(array.dtype).reshape(
+        array.shape, order=order)
+
+
+def _realize_array(val, path=None):
+    """
+    Returns a regular array for a block of an ASDF file
+    (`NDArrayType`), which is only read the first time it is needed.
+    The blocks are memory mapped read-only, and since the arrays of a
+    model can be modified in place, those are mapped again from
+    *path* copy-on-write, so that only the pages that are written to
+    are copied into memory.  Where that is not possible, the whole
+    block is copied.
+    """
+    array = np.asarray(val)
+    if not array.flags.writeable:
+        mapped = _map_copy_on_write(array, path)
+        if mapped is not None:
+            return mapped
+        array = np.array(array)
+        profiling.record_allocation(array)
+    return array
+
+
+def _make_default_array(attr, schema, ctx, view=False):
     dtype = schema.get('datatype')
     if dtype is not None:
         dtype = ndarray.asdf_datatype_to_numpy_dtype(dtype)
@@ -63,7 +165,11 @@ def _make_default_array(attr, schema, ctx):
         else:
             has_primary_array_shape = False
             if primary_array_name is not None:
-                primary_array = getattr(ctx, primary_array_name, None)
+                # Only the shape is needed, so look in the tree first
+                # rather than handing out the array itself.
+                primary_array = ctx._instance.get(primary_array_name)
+                if primary_array is None:
+                    primary_array = getattr(ctx, primary_array_name, None)
                 has_primary_array_shape = primary_array is not None
 
             if has_primary_array_shape:
@@ -76,9 +182,16 @@ def _make_default_array(attr, schema, ctx):
             else:
                 shape = tuple([0] * ndim)
 
-    array = np.empty(shape, dtype=dtype)
-    if default is not None:
+    if view and (dtype is None or dtype.names is None):
+        return _make_default_view(shape, dtype, default)
+
+    if default is None or default == 0:
+        # Leaves the pages to be zeroed by the OS as they are touched
+        array = np.zeros(shape, dtype=dtype)
+    else:
+        array = np.empty(shape, dtype=dtype)
         array[...] = default
+    profiling.record_allocation(array)
     return array
 
 
@@ -107,20 +220,64 @@ def _make_node(instance, schema, ctx):
 
 def _unmake_node(instance):
     if isinstance(instance, (ObjectNode, ListNode)):
+        if hasattr(instance, '_make_implicit_arrays'):
+            # A whole model is being stored in another tree, which
+            # needs all of its arrays.
+            instance._make_implicit_arrays(views=True)
         return instance._instance
     return instance
 
 
-def _get_schema_for_property(schema, attr):
+def _find_schema_for_property(schema, attr, memo):
     subschema = schema.get('properties', {}).get(attr, None)
     if subschema is not None:
         return subschema
     for combiner in ['allOf', 'anyOf']:
         for subschema in schema.get(combiner, []):
-            subsubschema = _get_schema_for_property(subschema, attr)
+            subsubschema = _get_schema_for_property(subschema, attr, memo)
             if subsubschema != {}:
                 return subsubschema
-    return {}
+    return None
+
+
+def _get_schema_for_property(schema, attr, memo=None):
+    # *memo* is a dict from `DataModel._get_schema_memo` in which the
+    # lookups are kept, by the id of the schema, for as long as the
+    # schema of the model lives.
+    if ('properties' not in schema and
+            'allOf' not in schema and
+            'anyOf' not in schema):
+        return {}
+
+    if memo is None:
+        subschema = _find_schema_for_property(schema, attr, None)
+    else:
+        entry = memo.get(id(schema))
+        if entry is None or entry[0] is not schema:
+            entry = memo[id(schema)] = (schema, {})
+        lookups = entry[1]
+        try:
+            subschema = lookups[attr]
+        except KeyError:
+            subschema = lookups[attr] = _find_schema_for_property(
+                schema, attr, memo)
+
+    if subschema is None:
+        # A new one each time, since nodes add '$schema' to theirs
+        return {}
+    return subschema
+
+
+def _get_validator(subschema, memo=None):
+    # *memo* is a dict from `DataModel._get_schema_memo`, in which the
+    # validators are kept in the same way as the property lookups.
+    if memo is None:
+        return schema.get_validator(subschema)
+    entry = memo.get(id(subschema))
+    if entry is None or entry[0] is not subschema:
+        entry = memo[id(subschema)] = (
+            subschema, schema.get_validator(subschema))
+    return entry[1]
 
 
 def _get_schema_for_index(schema, i):
@@ -134,6 +291,30 @@ def _get_schema_for_index(schema, i):
         return items
 
 
+# The values that are the same in their tagged form
+_PLAIN_TYPES = six.string_types + six.integer_types + (
+    bytes, float, bool, type(None))
+
+
+def _to_tagged_tree(instance, ctx):
+    """
+    Converts a tree to its tagged form for validation, leaving the
+    arrays as they are.  Converting an array would register a block
+    for it, or read it if it is lazily loaded, while the ``ndim`` and
+    ``datatype`` validators only need its shape and dtype.  Only the
+    dicts and lists of the tree are copied, and only the values of
+    custom types (such as times) are converted.
+    """
+    if isinstance(instance, (np.ndarray, ndarray.NDArrayType) + _PLAIN_TYPES):
+        return instance
+    elif isinstance(instance, dict):
+        return dict((key, _to_tagged_tree(val, ctx))
+                    for key, val in six.iteritems(instance))
+    elif isinstance(instance, list):
+        return [_to_tagged_tree(val, ctx) for val in instance]
+    return yamlutil.custom_tree_to_tagged_tree(instance, ctx)
+
+
 class Node(object):
     def __init__(self, instance, schema, ctx):
         self._instance = instance
@@ -142,10 +323,24 @@ class Node(object):
         self._ctx = ctx
 
     def _validate(self):
-        instance = yamlutil.custom_tree_to_tagged_tree(
-            self._instance, self._ctx._asdf)
-        schema.validate(
-            instance, schema=self._schema)
+        with profiling.phase('validate'):
+            instance = _to_tagged_tree(self._instance, self._ctx._asdf)
+            validator = _get_validator(
+                self._schema, self._ctx._get_schema_memo('validators'))
+            validator.validate(instance, _schema=self._schema)
+
+    def _check_writable(self):
+        # Models shared between callers, such as those of `refcache`,
+        # are marked read-only on their context.
+        if self._ctx._read_only:
+            raise ValueError("The model is read-only")
+
+    def _array_accessed(self, array):
+        # An array handed out may be modified in place, so it can no
+        # longer be assumed to match the file it was read from.
+        unchanged = self._ctx._unchanged_arrays
+        if unchanged:
+            unchanged.pop(id(array), None)
 
 
 class ObjectNode(Node):
@@ -164,7 +359,8 @@ class ObjectNode(Node):
         if attr.startswith('_'):
             raise AttributeError('No attribute {0}'.format(attr))
 
-        schema = _get_schema_for_property(self._schema, attr)
+        schema = _get_schema_for_property(
+            self._schema, attr, self._ctx._get_schema_memo('properties'))
 
         try:
             val = self._instance[attr]
@@ -172,7 +368,24 @@ class ObjectNode(Node):
             if schema == {}:
                 raise AttributeError("No attribute '{0}'".format(attr))
             val = _make_default(attr, schema, self._ctx)
-            self._instance[attr] = val
+            if self._ctx._read_only:
+                # The tree may be shared between threads, so keep the
+                # first default created, and don't let it be modified.
+                if isinstance(val, np.ndarray):
+                    val.flags.writeable = False
+                val = self._instance.setdefault(attr, val)
+            else:
+                self._instance[attr] = val
+        else:
+            if isinstance(val, DefaultArrayView):
+                val = materialize_default_array(val)
+                self._instance[attr] = val
+            elif isinstance(val, ndarray.NDArrayType):
+                self._array_accessed(val)
+                val = self._instance[attr] = _realize_array(
+                    val, self._ctx._asdf_path)
+            elif isinstance(val, np.ndarray):
+                self._array_accessed(val)
 
         return _make_node(val, schema, self._ctx)
 
@@ -180,7 +393,10 @@ class ObjectNode(Node):
         if attr.startswith('_'):
             self.__dict__[attr] = val
         else:
-            schema = _get_schema_for_property(self._schema, attr)
+            self._check_writable()
+            schema = _get_schema_for_property(
+                self._schema, attr,
+                self._ctx._get_schema_memo('properties'))
             if val is None:
                 val = _make_default(attr, schema, self._ctx)
             val = _cast(val, schema)
@@ -200,6 +416,7 @@ class ObjectNode(Node):
         if attr.startswith('_'):
             del self.__dict__[attr]
         else:
+            self._check_writable()
             old_val = self._instance.get(attr, None)
             try:
                 del self._instance[attr]
@@ -242,14 +459,25 @@ class ListNode(Node):
 
     def __getitem__(self, i):
         schema = _get_schema_for_index(self._schema, i)
-        return _make_node(self._instance[i], schema, self._ctx)
+        val = self._instance[i]
+        if isinstance(val, DefaultArrayView):
+            val = self._instance[i] = materialize_default_array(val)
+        elif isinstance(val, ndarray.NDArrayType):
+            self._array_accessed(val)
+            val = self._instance[i] = _realize_array(
+                val, self._ctx._asdf_path)
+        elif isinstance(val, np.ndarray):
+            self._array_accessed(val)
+        return _make_node(val, schema, self._ctx)
 
     def __setitem__(self, i, val):
+        self._check_writable()
         schema = _get_schema_for_index(self._schema, i)
         self._instance[i] = _cast(val, schema)
         self._validate()
 
     def __delitem__(self, i):
+        self._check_writable()
         del self._instance[i]
         self._validate()
 
@@ -265,6 +493,7 @@ class ListNode(Node):
         return _make_node(self._instance[i:j], schema, self._ctx)
 
     def __setslice__(self, i, j, other):
+        self._check_writable()
         parts = _unmake_node(other)
         parts = [_cast(x, _get_schema_for_index(self._schema, k))
                  for (k, x) in enumerate(parts)]
@@ -272,26 +501,31 @@ class ListNode(Node):
         self._validate()
 
     def __delslice__(self, i, j):
+        self._check_writable()
         del self._instance[i:j]
         self._validate()
 
     def append(self, item):
+        self._check_writable()
         schema = _get_schema_for_index(self._schema, len(self._instance))
         self._instance.append(_cast(item, schema))
         self._validate()
 
     def insert(self, i, item):
+        self._check_writable()
         schema = _get_schema_for_index(self._schema, i)
         self._instance.insert(i, _cast(item, schema))
         self._validate()
 
     def pop(self, i=-1):
+        self._check_writable()
         schema = _get_schema_for_index(self._schema, 0)
         x = self._instance.pop(i)
         self._validate()
         return _make_node(x, schema, self._ctx)
 
     def remove(self, item):
+        self._check_writable()
         self._instance.remove(item)
         self._validate()
 
@@ -302,10 +536,12 @@ class ListNode(Node):
         return self._instance.index(item)
 
     def reverse(self):
+        self._check_writable()
         self._instance.reverse()
         self._validate()
 
     def sort(self, *args, **kwargs):
+        self._check_writable()
         self._instance.sort(*args, **kwargs)
         self._validate()
 
@@ -28,6 +28,7 @@ class RampModel(model_base.DataModel):
         The error array.
     """
     schema_url = "ramp.schema.yaml"
+    _implicit_arrays = ('pixeldq', 'groupdq', 'err')
 
     def __init__(self, init=None, data=None, pixeldq=None, groupdq=None,
                  err=None, zeroframe=None, **kwargs):
@@ -47,8 +48,3 @@ class RampModel(model_base.DataModel):
 
         if zeroframe is not None:
             self.zeroframe = zeroframe
-
-        # Implicitly create arrays
-        self.pixeldq = self.pixeldq
-        self.groupdq = self.groupdq
-        self.err = self.err
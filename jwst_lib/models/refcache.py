@@ -0,0 +1,220 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""
+A process-wide cache of reference file models.
+
+Calibration steps open the same reference files for every exposure
+of a batch.  `get_reference_model` returns a shared, read-only
+instance of the model for a given file, so that only the first open
+pays for parsing the file and running `dynamic_mask`::
+
+    from jwst_lib.models import DarkModel, refcache
+
+    dark = refcache.get_reference_model(DarkModel, 'dark.fits')
+
+The cached models are fully loaded into memory and their files are
+closed.  Since the same instance is handed to every caller, the
+models are read-only: their arrays can not be written to, and setting
+their attributes raises a `ValueError`.  Make a
+`~jwst_lib.models.DataModel.copy` to get a model that can be modified.
+
+Different files are loaded concurrently, while the threads asking for
+a file that is already being loaded wait for it.
+
+A cached model is used only while the file's modification time and
+size are unchanged.  The least recently used models are evicted once
+the total size of the cached arrays exceeds the limit of the cache.
+"""
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import os
+import threading
+
+import numpy as np
+
+from astropy.extern import six
+from astropy.utils.compat.odict import OrderedDict
+
+from pyasdf.tags.core import ndarray
+
+
+__all__ = ['ReferenceCache', 'get_reference_model', 'flush',
+           'default_cache']
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def _freeze(node):
+    # Replaces all of the arrays in the tree with read-only in-memory
+    # copies, and returns their total size.
+    nbytes = 0
+    if isinstance(node, dict):
+        items = six.iteritems(node)
+    elif isinstance(node, list):
+        items = enumerate(node)
+    else:
+        return 0
+
+    for key, val in list(items):
+        if isinstance(val, (np.ndarray, ndarray.NDArrayType)):
+            val = np.array(val)
+            val.flags.writeable = False
+            node[key] = val
+            nbytes += val.nbytes
+        else:
+            nbytes += _freeze(val)
+    return nbytes
+
+
+def _load(model_class, path):
+    # Opens a model fully into memory and makes it read-only.  Returns
+    # the model and the total size of its arrays.
+    model = model_class(path)
+    try:
+        model._make_implicit_arrays()
+        nbytes = _freeze(model._instance)
+    finally:
+        model.close()
+    del model._files_to_close[:]
+    model._unchanged_arrays.clear()
+    model._read_only = True
+    return model, nbytes
+
+
+class ReferenceCache(object):
+    """
+    A cache of read-only reference file models, bounded by the total
+    size of their arrays.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        The maximum total size of the arrays of the cached models.
+        A single model larger than this is still cached until the
+        next one is added.
+
+    Attributes
+    ----------
+    hits, misses, evictions : int
+        Counters of the lookups that found a model in the cache,
+        those that had to open the file, and the models evicted to
+        make room for new ones.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        # A lock for each file being loaded
+        self._loading = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        """
+        The total size of the arrays of the cached models.
+        """
+        return self._nbytes
+
+    def get(self, model_class, path):
+        """
+        Get the shared instance of *model_class* for the given file,
+        opening it if it is not already in the cache.
+
+        Parameters
+        ----------
+        model_class : DataModel subclass
+
+        path : str
+            Path to the reference file.
+
+        Returns
+        -------
+        model : model_class instance
+            The shared, read-only model.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        ident = (path, model_class)
+        key = ident + (stat.st_mtime, stat.st_size)
+
+        with self._lock:
+            model = self._lookup(ident, key)
+            if model is not None:
+                return model
+            loading = self._loading.setdefault(ident, threading.Lock())
+
+        # The file is opened outside of the lock of the cache, so that
+        # other files can be loaded in the meantime.
+        with loading:
+            with self._lock:
+                # It may have been loaded while waiting
+                model = self._lookup(ident, key)
+                if model is not None:
+                    return model
+                self.misses += 1
+
+            try:
+                model, nbytes = _load(model_class, path)
+                with self._lock:
+                    self._entries[ident] = (key, model, nbytes)
+                    self._nbytes += nbytes
+                    self._evict()
+            finally:
+                with self._lock:
+                    if self._loading.get(ident) is loading:
+                        del self._loading[ident]
+            return model
+
+    def _lookup(self, ident, key):
+        # Returns the cached model, if it is still current
+        entry = self._entries.pop(ident, None)
+        if entry is None:
+            return None
+        if entry[0] == key:
+            self._entries[ident] = entry
+            self.hits += 1
+            return entry[1]
+        # The file has changed since it was cached
+        self._nbytes -= entry[2]
+        return None
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and len(self._entries) > 1:
+            ident = next(iter(self._entries))
+            entry = self._entries.pop(ident)
+            self._nbytes -= entry[2]
+            self.evictions += 1
+
+    def flush(self):
+        """
+        Remove all of the models from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+default_cache = ReferenceCache(
+    int(os.environ.get('JWST_MODELS_REFCACHE_BYTES', DEFAULT_MAX_BYTES)))
+
+
+def get_reference_model(model_class, path):
+    """
+    Get the shared instance of *model_class* for the given file from
+    the process-wide cache.  See `ReferenceCache.get`.
+    """
+    return default_cache.get(model_class, path)
+
+
+def flush():
+    """
+    Remove all of the models from the process-wide cache.
+    """
+    default_cache.flush()
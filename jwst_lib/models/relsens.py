@@ -0,0 +1,44 @@
+from __future__ import absolute_import, unicode_literals, division, print_function
+
+import numpy as np
+
+from . import util
+
+
+class _RelsensMixin(object):
+    """
+    Adds interpolation of the ``relsens`` relative sensitivity table
+    to the models that have one.
+    """
+    def _get_relsens_tables(self):
+        return [self.relsens]
+
+    def _get_relsens_interpolator(self):
+        # The tables are sorted and packed into a grid once, and the
+        # grid is kept for as long as they are the same arrays.
+        tables = self._get_relsens_tables()
+        return util.get_cached(
+            self, 'relsens_interpolator', tables,
+            lambda: util.RowInterpolator.from_tables(
+                tables, 'wavelength', 'response'))
+
+    def interpolate_relsens(self, wavelength):
+        """
+        Interpolate the relative sensitivity table.
+
+        The table is sorted on wavelength the first time this is
+        called, and kept for as long as ``relsens`` is the same array.
+
+        Parameters
+        ----------
+        wavelength : scalar or array
+            The wavelengths at which to evaluate the response.
+
+        Returns
+        -------
+        response : scalar or array
+            The same shape as *wavelength*.
+        """
+        interpolator = self._get_relsens_interpolator()
+        wavelength = np.asarray(wavelength)
+        return interpolator(wavelength.ravel())[0].reshape(wavelength.shape)
@@ -28,6 +28,7 @@ class ResetModel(model_base.DataModel):
         The data quality definitions table.
     """
     schema_url = "reset.schema.yaml"
+    _implicit_arrays = ('dq', 'err')
 
     def __init__(self, init=None, data=None, dq=None, err=None,
                  dq_def=None, **kwargs):
@@ -45,8 +46,5 @@ class ResetModel(model_base.DataModel):
         if dq_def is not None:
             self.dq_def = dq_def
 
-        self.dq = dynamic_mask(self)
-
-        # Implicitly create arrays
-        self.dq = self.dq
-        self.err = self.err
+        if len(self.dq_def):
+            self.dq = dynamic_mask(self)
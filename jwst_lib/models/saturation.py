@@ -24,6 +24,7 @@ class SaturationModel(model_base.DataModel):
         The data quality definitions table.
     """
     schema_url = "saturation.schema.yaml"
+    _implicit_arrays = ('dq',)
 
     def __init__(self, init=None, data=None, dq=None, dq_def=None, **kwargs):
         super(SaturationModel, self).__init__(init=init, **kwargs)
@@ -37,7 +38,5 @@ class SaturationModel(model_base.DataModel):
         if dq_def is not None:
             self.dq_def = dq_def
 
-        self.dq = dynamic_mask(self)
-
-        # Implicitly create arrays
-        self.dq = self.dq
+        if len(self.dq_def):
+            self.dq = dynamic_mask(self)
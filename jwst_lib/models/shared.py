@@ -0,0 +1,232 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""
+Sharing the arrays of a read-only model between processes.
+
+When exposures are processed in a pool of worker processes, each
+worker would otherwise open its own copy of the reference files.
+Instead, the parent can publish the arrays of a model once with
+`share`, and send the small, picklable handle it returns to the
+workers, which reconstruct the model without copying any of the
+arrays::
+
+    from jwst_lib.models import LinearityModel, shared
+
+    with LinearityModel('linearity.fits') as model:
+        handle = shared.share(model)
+
+    def process(handle, exposure):
+        linearity = handle.open()
+        ...
+
+    pool.map(functools.partial(process, handle), exposures)
+    handle.unlink()
+
+The arrays are placed in `multiprocessing.shared_memory` where it is
+available (Python 3.8 and later), and otherwise in memory-mapped
+``.npy`` files in a temporary directory.  Either way, the arrays of
+the reconstructed models are read-only.
+
+The reconstructed model uses the schema of its class, so any
+extensions made with `~jwst_lib.models.DataModel.extend_schema` are
+not carried over.
+"""
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from pyasdf.tags.core import ndarray
+
+from . import util
+
+
+__all__ = ['share', 'SharedModel']
+
+
+class _ArrayRef(object):
+    # Stands in for an array in the tree of a shared model
+    def __init__(self, method, location, dtype, shape):
+        self.method = method
+        self.location = location
+        self.dtype = dtype
+        self.shape = shape
+
+
+def _attach_segment(name):
+    # Attaches to an existing segment without taking ownership of it.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    segment = shared_memory.SharedMemory(name=name)
+    if shared_memory._USE_POSIX:
+        # Before Python 3.13, attaching registers the segment with the
+        # resource tracker of this process, which would unlink it when
+        # the process exits, while the other workers still use it.
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+class _Segment(object):
+    # Keeps a shared memory segment attached for as long as the model
+    # using it is open.
+    def __init__(self, segment):
+        self._segment = segment
+
+    def close(self):
+        try:
+            self._segment.close()
+        except BufferError:
+            # Arrays from the model still refer to the segment; it is
+            # detached when they are garbage collected.
+            pass
+
+
+class SharedModel(object):
+    """
+    A picklable handle to a model whose arrays have been published
+    with `share`.
+    """
+    def __init__(self, model_class, tree, shape, method, directory=None,
+                 segments=None):
+        self._model_class = model_class
+        self._tree = tree
+        self._shape = shape
+        self._method = method
+        self._directory = directory
+        self._segments = segments or []
+
+    def __getstate__(self):
+        # Only the handle returned by `share` owns the storage, so
+        # that `unlink` does nothing in the workers.
+        state = self.__dict__.copy()
+        state['_segments'] = []
+        state['_directory'] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.unlink()
+
+    @property
+    def method(self):
+        """
+        ``'shared_memory'`` or ``'memmap'``.
+        """
+        return self._method
+
+    def open(self):
+        """
+        Reconstruct the model, with its arrays referring directly to
+        the shared storage.
+
+        Returns
+        -------
+        model : DataModel instance
+            The model, of the same class as the one that was shared.
+            It should be closed when no longer needed.
+        """
+        to_close = []
+
+        def attach(ref):
+            if ref.method == 'memmap':
+                return np.load(ref.location, mmap_mode='r')
+            segment = _attach_segment(ref.location)
+            to_close.append(_Segment(segment))
+            array = np.ndarray(ref.shape, dtype=ref.dtype, buffer=segment.buf)
+            array.flags.writeable = False
+            return array
+
+        tree = util.map_arrays(self._tree, _ArrayRef, attach)
+        model = self._model_class._from_tree(tree, shape=self._shape)
+        model._files_to_close.extend(to_close)
+        return model
+
+    def unlink(self):
+        """
+        Release the shared storage, once none of the workers need the
+        model any more.  This only has an effect on the handle
+        returned by `share`, not on the copies sent to the workers.
+        """
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        del self._segments[:]
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+
+def share(model, method=None, directory=None):
+    """
+    Publish the arrays of a model for use by other processes.
+
+    Parameters
+    ----------
+    model : DataModel instance
+
+    method : str, optional
+        ``'shared_memory'`` or ``'memmap'``.  By default,
+        ``'shared_memory'`` is used where available.
+
+    directory : str, optional
+        For the ``'memmap'`` method, the directory in which to create
+        the temporary directory holding the arrays.  Defaults to the
+        system temporary directory.
+
+    Returns
+    -------
+    handle : SharedModel
+    """
+    if method is None:
+        method = 'memmap' if shared_memory is None else 'shared_memory'
+    if method == 'shared_memory':
+        if shared_memory is None:
+            raise ValueError(
+                "multiprocessing.shared_memory is not available")
+    elif method == 'memmap':
+        directory = tempfile.mkdtemp(prefix='jwst_models_', dir=directory)
+    else:
+        raise ValueError("Unknown sharing method {0!r}".format(method))
+
+    segments = []
+    counter = [0]
+
+    def publish(array):
+        array = np.asarray(array)
+        if method == 'memmap':
+            path = os.path.join(directory, '{0}.npy'.format(counter[0]))
+            counter[0] += 1
+            np.save(path, array)
+            return _ArrayRef(method, path, array.dtype, array.shape)
+        segment = shared_memory.SharedMemory(
+            create=True, size=max(array.nbytes, 1))
+        segments.append(segment)
+        np.ndarray(array.shape, dtype=array.dtype,
+                   buffer=segment.buf)[...] = array
+        return _ArrayRef(method, segment.name, array.dtype, array.shape)
+
+    try:
+        tree = util.map_arrays(
+            model._instance, (np.ndarray, ndarray.NDArrayType), publish)
+    except Exception:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+        if directory is not None and method == 'memmap':
+            shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    return SharedModel(model.__class__, tree, model._shape, method,
+                       directory if method == 'memmap' else None, segments)
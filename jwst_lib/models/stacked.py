@@ -0,0 +1,235 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+"""
+A lazily-evaluated stack of the arrays of many exposures.
+
+Steps that combine the members of an association, such as median
+filtering and outlier detection, would need all of the exposures in
+memory at once if they were opened as models up front.  A
+`StackedView` instead behaves like a read-only array whose first axis
+runs over the member files, and only reads the members and the parts
+of their arrays that are actually indexed::
+
+    from jwst_lib.models import AsnModel
+
+    with AsnModel('asn.fits') as asn:
+        with asn.stack_members() as stack:
+            median = np.empty(stack.shape[1:], dtype=stack.dtype)
+            for index, block in stack.iter_tiles((256, 256)):
+                median[index] = np.median(block, axis=0)
+
+The arrays of FITS members are memory mapped, so the memory used is
+about that of the sections being read, rather than that of the
+whole stack.  The arrays of compressed FITS files cannot be memory
+mapped and are read in full for each member that is opened.
+"""
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import itertools
+
+import numpy as np
+
+from astropy.extern import six
+from astropy.extern.six.moves import range
+from astropy.utils.compat.odict import OrderedDict
+
+
+__all__ = ['StackedView']
+
+
+class StackedView(object):
+    """
+    A read-only view of the same array of several member files,
+    stacked along a new first axis.
+
+    Parameters
+    ----------
+    paths : list of str
+        The member files, in stack order.
+
+    attribute : str, optional
+        The name of the array to stack.  Defaults to ``'data'``.
+
+    model_class : DataModel subclass, optional
+        The class used to open the members.  By default,
+        `jwst_lib.models.open` determines it from the first member,
+        and the same class is used for the others.
+
+    max_open : int, optional
+        The maximum number of members kept open between reads; the
+        least recently used ones are closed first.  By default, the
+        members stay open until the view is closed, which avoids
+        reopening them for every section, at the cost of a file
+        handle and a memory mapping for each.
+
+        With fewer than ``len(self)`` members open, reading a section
+        across all of the members has to reopen most of them, so each
+        tile of `iter_tiles` costs ``len(self) - max_open`` opens.
+    """
+    def __init__(self, paths, attribute='data', model_class=None,
+                 max_open=None):
+        if max_open is not None and max_open < 1:
+            raise ValueError("max_open must be at least 1")
+        self._paths = list(paths)
+        if not len(self._paths):
+            raise ValueError("No members to stack")
+        self._attribute = attribute
+        self._model_class = model_class
+        self._max_open = max_open
+        self._models = OrderedDict()
+        self._member_shape = None
+
+        try:
+            first = self._member_array(0)
+        except Exception:
+            self.close()
+            raise
+        self._member_shape = first.shape
+        self._dtype = first.dtype
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._paths)
+
+    @property
+    def shape(self):
+        return (len(self._paths),) + self._member_shape
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    def close(self):
+        """
+        Close all of the members that are open.
+        """
+        while self._models:
+            self._models.popitem(last=False)[1].close()
+
+    def _get_model(self, i):
+        model = self._models.pop(i, None)
+        if model is None:
+            model = self._open_member(self._paths[i])
+            while (self._max_open is not None and
+                   len(self._models) >= self._max_open):
+                self._models.popitem(last=False)[1].close()
+        self._models[i] = model
+        return model
+
+    def _open_member(self, path):
+        if self._model_class is None:
+            from . import open
+            model = open(path)
+            # The members are all of the same kind, so the others are
+            # opened directly, without `open` inspecting each file.
+            self._model_class = model.__class__
+            return model
+        return self._model_class(path)
+
+    def _member_array(self, i):
+        model = self._get_model(i)
+        # The array is taken from the tree directly, so that it is not
+        # copied into memory when the model is backed by an ASDF file.
+        array = model._instance.get(self._attribute)
+        if array is None:
+            array = getattr(model, self._attribute)
+        array = np.asarray(array)
+        if (self._member_shape is not None and
+                array.shape != self._member_shape):
+            raise ValueError(
+                "Member {0!r} has {1} of shape {2}, expected {3}".format(
+                    self._paths[i], self._attribute, array.shape,
+                    self._member_shape))
+        return array
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if not len(key):
+            key = (Ellipsis,)
+        index, rest = key[0], key[1:]
+        if index is Ellipsis:
+            index, rest = slice(None), key
+
+        if isinstance(index, six.integer_types + (np.integer,)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("index out of range")
+            return np.array(self._member_array(index)[rest])
+
+        indices = np.arange(len(self))[index]
+        if indices.ndim != 1:
+            raise IndexError(
+                "Only integers, slices and 1-D sequences may index the "
+                "stack axis")
+
+        out = None
+        for j, i in enumerate(indices):
+            section = self._member_array(i)[rest]
+            if out is None:
+                out = np.empty((len(indices),) + np.shape(section),
+                               dtype=self._dtype)
+            out[j] = section
+        if out is None:
+            shape = self._member_array(0)[rest].shape
+            out = np.empty((0,) + shape, dtype=self._dtype)
+        return out
+
+    def iter_tiles(self, tile_shape):
+        """
+        Iterate over the stack in tiles spanning all of the members.
+
+        Parameters
+        ----------
+        tile_shape : tuple of int
+            The shape of the tiles, over the axes of a member's array.
+            The tiles at the upper edges may be smaller.
+
+        Yields
+        ------
+        index : tuple of slice
+            The location of the tile within a member's array.
+
+        block : numpy array
+            The stack over the tile, of shape ``(len(self),) +
+            tile``.
+
+        Notes
+        -----
+        When *max_open* is smaller than the number of members, the
+        members are read in alternating order from one tile to the
+        next, so that those still open from the previous tile are
+        read first.  The others are reopened for every tile.
+        """
+        tile_shape = tuple(tile_shape)
+        if len(tile_shape) != len(self._member_shape):
+            raise ValueError(
+                "tile_shape must have {0} dimensions".format(
+                    len(self._member_shape)))
+
+        starts = [range(0, size, step)
+                  for size, step in zip(self._member_shape, tile_shape)]
+        order = list(range(len(self)))
+        for corner in itertools.product(*starts):
+            index = tuple(slice(start, start + step)
+                          for start, step in zip(corner, tile_shape))
+            block = None
+            for i in order:
+                section = self._member_array(i)[index]
+                if block is None:
+                    block = np.empty((len(self),) + section.shape,
+                                     dtype=self._dtype)
+                block[i] = section
+            yield index, block
+            if self._max_open is not None:
+                order.reverse()
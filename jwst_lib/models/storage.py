@@ -146,10 +146,10 @@ class TreeStorage(Storage):
 
         Parameters
         ----------
-        model : ModelBase object
+        model : DataModel object
 
         hdu_name : str, optional
-            The name of the HDU to get the WCS from.  This must use
+            The name of the HDU to get the header for.  This must use
             named HDU's, not numerical order HDUs.  To get the primary HDU,
             pass ``'PRIMARY'`` (default).
 
@@ -157,23 +157,7 @@ class TreeStorage(Storage):
         -------
         header : `~astropy.io.fits.Header` object
         """
-        from astropy.io import fits
-        from . import schema
-
-        elements = schema.get_elements_for_fits_hdu(
-            model.schema, hdu_name=hdu_name)
-
-        header = fits.Header()
-
-        for keyword, path in elements.items():
-            val = model.get_item_as_json_value(path)
-            if isinstance(val, list):
-                for subval in val:
-                    header[keyword] = subval
-            else:
-                header[keyword] = val
-
-        return header
+        return model.get_fits_header(hdu_name)
 
     @property
     def history(self):
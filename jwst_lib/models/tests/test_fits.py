@@ -3,6 +3,7 @@
 
 from __future__ import absolute_import, division, unicode_literals, print_function
 
+import io
 import os
 import shutil
 import tempfile
@@ -420,3 +421,230 @@ def test_metadata_from_fits():
 
 #     with DataModel(TMP_FITS) as dm:
 #         assert dm.meta.subarray.xstart == 42.7
+
+
+def test_get_fits_header():
+    from astropy.io import fits
+
+    with ImageModel((50, 50)) as dm:
+        dm.meta.instrument.name = 'NIRCAM'
+        dm.meta.subarray.xstart = 42
+        header = dm.get_fits_header('PRIMARY')
+        dm.save(TMP_FITS, clobber=True)
+
+    assert header['INSTRUME'] == 'NIRCAM'
+    assert 'NAXIS' not in header
+
+    with fits.open(TMP_FITS) as hdulist:
+        written = [
+            (card.keyword, card.value) for card in hdulist[0].header.cards
+            if card.keyword not in ('SIMPLE', 'BITPIX', 'NAXIS', 'EXTEND')]
+
+    generated = [(card.keyword, card.value) for card in header.cards]
+    # The filename and date are only filled in on save
+    assert ([x for x in generated if x[0] not in ('FILENAME', 'DATE')] ==
+            [x for x in written if x[0] not in ('FILENAME', 'DATE')])
+
+
+def test_update_in_place():
+    from astropy.io import fits
+
+    with ImageModel((50, 50)) as dm:
+        dm.data[...] = 42
+        dm.meta.instrument.name = 'NIRCAM'
+        dm.save(TMP_FITS)
+
+    size = os.path.getsize(TMP_FITS)
+    with ImageModel(TMP_FITS) as dm:
+        assert dm._unchanged_arrays
+        dm.meta.instrument.name = 'MIRI'
+        dm.dq[0, 0] = 4
+        dm.save(TMP_FITS, update_in_place=True)
+        # SCI was never handed out, so it is still known to be the
+        # same as in the file
+        assert id(dm._instance['data']) in dm._unchanged_arrays
+
+    assert os.path.getsize(TMP_FITS) == size
+    with fits.open(TMP_FITS) as hdulist:
+        assert hdulist[0].header['INSTRUME'] == 'MIRI'
+        assert hdulist['DQ'].data[0, 0] == 4
+        assert np.all(hdulist['SCI'].data == 42)
+
+    with ImageModel(TMP_FITS) as dm:
+        assert dm.meta.instrument.name == 'MIRI'
+        assert dm.dq[0, 0] == 4
+        assert np.all(dm.data == 42)
+
+
+def test_update_in_place_new_hdu():
+    from astropy.io import fits
+
+    with ImageModel((50, 50)) as dm:
+        dm.save(TMP_FITS, default_arrays='omit')
+
+    # The file has no DQ extension yet, so it has to be written out
+    # in full
+    with ImageModel(TMP_FITS) as dm:
+        dm.dq[0, 0] = 4
+        dm.save(TMP_FITS, update_in_place=True)
+
+    with fits.open(TMP_FITS) as hdulist:
+        assert hdulist['DQ'].data[0, 0] == 4
+
+
+def test_gzip_fits():
+    path = os.path.join(TMP_DIR, 'tmp.fits.gz')
+    with ImageModel((50, 50)) as dm:
+        dm.data[...] = 42
+        dm.save(path)
+
+    with io.open(path, 'rb') as fd:
+        assert fd.read(2) == b'\x1f\x8b'
+
+    with ImageModel(path) as dm:
+        assert np.all(dm.data == 42)
+
+
+def test_tile_compression():
+    from astropy.io import fits
+
+    data = np.random.rand(50, 50).astype(np.float32)
+    dq = np.random.randint(0, 16, (50, 50)).astype(np.uint32)
+    with ImageModel(data=data, dq=dq) as dm:
+        dm.save(TMP_FITS, compression={'ERR': None})
+
+    with fits.open(TMP_FITS) as hdulist:
+        assert isinstance(hdulist['SCI'], fits.CompImageHDU)
+        assert isinstance(hdulist['DQ'], fits.CompImageHDU)
+        assert not isinstance(hdulist['ERR'], fits.CompImageHDU)
+
+    with fits.open(TMP_FITS, disable_image_compression=True) as hdulist:
+        assert hdulist['DQ'].header['ZCMPTYPE'] == 'RICE_1'
+        assert hdulist['SCI'].header['ZCMPTYPE'] == 'GZIP_2'
+
+    # Both compressions are lossless
+    with ImageModel(TMP_FITS) as dm:
+        assert_array_equal(dm.data, data)
+        assert_array_equal(dm.dq, dq)
+
+
+@raises(ValueError)
+def test_unknown_compression():
+    with ImageModel((50, 50)) as dm:
+        dm.save(TMP_FITS, compression={'DQ': 'ZIP'})
+
+
+def test_gentle_asarray_fits_rec():
+    from astropy.io import fits
+    from .. import util
+
+    table = np.array(
+        [(1, 2.0), (3, 4.0)],
+        dtype=[(str('A'), str('>i4')), (str('B'), str('>f8'))])
+    fits.BinTableHDU(table, name='TABLE').writeto(TMP_FITS, clobber=True)
+    dtype = [(str('a'), str('<i4')), (str('b'), str('<f8'))]
+
+    with fits.open(TMP_FITS) as hdulist:
+        data = hdulist['TABLE'].data
+        result = util.gentle_asarray(data, dtype)
+        assert result.dtype.names == ('a', 'b')
+        assert not isinstance(result, fits.FITS_rec)
+        assert np.may_share_memory(result, data)
+        assert_array_equal(result['a'], [1, 3])
+        assert_array_equal(result['b'], [2.0, 4.0])
+        assert util.gentle_asarray(data, dtype).dtype == result.dtype
+        assert_array_equal(result.a, [1, 3])
+
+
+def test_gentle_asarray_fits_rec_strings():
+    from astropy.io import fits
+    from .. import util
+
+    table = np.array(
+        [(1, b'ab  '), (2, b'c')],
+        dtype=[(str('A'), str('>i4')), (str('B'), str('S4'))])
+    fits.BinTableHDU(table, name='TABLE').writeto(TMP_FITS, clobber=True)
+    dtype = [(str('a'), str('<i4')), (str('b'), str('S4'))]
+
+    with fits.open(TMP_FITS) as hdulist:
+        data = hdulist['TABLE'].data
+        result = util.gentle_asarray(data, dtype)
+        # The strings come back without their padding, as from the
+        # FITS_rec itself
+        assert list(result.b) == [b'ab', b'c']
+        assert list(result['b']) == [b'ab', b'c']
+        assert_array_equal(result.a, [1, 2])
+
+    # Columns modified through the FITS_rec are kept
+    with fits.open(TMP_FITS) as hdulist:
+        data = hdulist['TABLE'].data
+        data.field('A')[1] = 5
+        result = util.gentle_asarray(data, dtype)
+        assert_array_equal(result.a, [1, 5])
+
+
+def test_time_values_are_converted():
+    import datetime
+    from astropy.time import Time
+    from .. import fits_support
+
+    schema = {
+        'type': 'object',
+        'properties': {
+            'date': {'type': 'string', 'fits_keyword': 'DATE'},
+            'meta': {
+                'type': 'object',
+                'patternProperties': {
+                    '^date_': {'type': 'string', 'fits_keyword': 'DATE-OBS'}
+                },
+                'additionalProperties': {
+                    'type': 'string', 'fits_keyword': 'DATE-END'}
+            }
+        }
+    }
+    tree = {
+        'date': datetime.datetime(2014, 1, 2, 3, 4, 5),
+        'meta': {
+            'date_obs': Time('2014-01-01T00:00:00'),
+            'end': Time('2014-01-01T01:00:00')
+        }
+    }
+
+    hdus = fits_support._collect_hdus(tree, schema)
+    header = hdus.get(0).to_header()
+    assert header['DATE'] == '2014-01-02 03:04:05.000'
+    assert header['DATE-OBS'] == '2014-01-01 00:00:00.000'
+    assert header['DATE-END'] == '2014-01-01 01:00:00.000'
+    # The tree itself is left alone
+    assert isinstance(tree['meta']['date_obs'], Time)
+
+
+def test_hdu_collection():
+    from .. import fits_support
+
+    hdus = fits_support._HDUCollection()
+    first = hdus.get('SCI')
+    # Index 0 finds the HDU created without an index, and keeps it so
+    assert hdus.get('SCI', 0) is first
+    assert first.index is None
+    second = hdus.get('SCI', 1)
+    assert second is not first
+    assert hdus.get('SCI') is first
+    assert hdus.get('sci', 1) is second
+
+    first.data = np.zeros((2, 3), dtype=np.float32)
+    first.append('FOO', 42, 'a comment')
+    first.add_comment_sections(['Section'])
+    second.data = np.zeros((2, 3), dtype=np.float32)
+    second.append('FOO', 43)
+
+    hdulist = hdus.to_hdulist()
+    assert [hdu.name for hdu in hdulist] == ['PRIMARY', 'SCI', 'SCI']
+    hdu = hdulist[('SCI', 1)]
+    assert hdu.header['FOO'] == 42
+    assert hdu.header.comments['FOO'] == 'a comment'
+    assert hdu.header['NAXIS1'] == 3
+    assert list(hdu.header.keys()).index('NAXIS') < list(
+        hdu.header.keys()).index('FOO')
+    assert hdulist[('SCI', 2)].header['FOO'] == 43
+    assert hdulist[('SCI', 2)].header['EXTVER'] == 2
@@ -1,5 +1,6 @@
 from __future__ import absolute_import, unicode_literals, division, print_function
 
+import copy
 import datetime
 import os
 import shutil
@@ -19,7 +20,9 @@ import numpy as np
 from numpy.testing.decorators import knownfailureif
 from numpy.testing import assert_array_equal
 
-from .. import DataModel, ImageModel, RampModel, MultiSlitModel, open
+from pyasdf import AsdfFile
+
+from .. import DataModel, ImageModel, RampModel, MultiSlitModel, AsnModel, open
 from .. import schema
 
 
@@ -369,3 +372,446 @@ def test_image_with_extra_keyword_to_multislit():
         assert len(ms.slits) == 3
         for slit in ms.slits:
             assert slit.data.shape == (4, 4)
+
+
+def test_photom_lookup():
+    from .. import NircamPhotomModel
+
+    dtype = [(str('filter'), str('S12')), (str('pupil'), str('S12')),
+             (str('photmjsr'), str('f4')), (str('uncertainty'), str('f4')),
+             (str('nelem'), str('i2')),
+             (str('wavelength'), str('f4'), (50,)),
+             (str('relresponse'), str('f4'), (50,))]
+    table = np.zeros((3,), dtype=dtype)
+    table['filter'] = [b'F090W', b'F090W', b'F150W']
+    table['pupil'] = [b'CLEAR', b'GRISMR', b'CLEAR']
+    table['photmjsr'] = [1.0, 2.0, 3.0]
+    table['nelem'] = [5, 0, 10]
+    table['wavelength'] = np.arange(50)
+
+    with NircamPhotomModel(phot_table=table) as pm:
+        row, wavelength, response = pm.lookup(filter='F090W', pupil='GRISMR')
+        assert row['photmjsr'] == 2.0
+        assert len(wavelength) == 0
+
+        row, wavelength, response = pm.lookup(filter=b'F150W ')
+        assert row['photmjsr'] == 3.0
+        assert_array_equal(wavelength, np.arange(10))
+        assert response.shape == (10,)
+
+        try:
+            pm.lookup(filter='F200W', pupil='CLEAR')
+        except KeyError:
+            pass
+        else:
+            assert False
+
+
+def test_relsens_interpolation():
+    relsens = np.zeros((3,), dtype=[(str('wavelength'), str('f8')),
+                                    (str('response'), str('f8'))])
+    relsens['wavelength'] = [3.0, 1.0, 2.0]
+    relsens['response'] = [30.0, 10.0, 20.0]
+
+    with ImageModel(relsens=relsens) as im:
+        assert_array_equal(
+            im.interpolate_relsens([[0.0, 1.5], [2.5, 4.0]]),
+            [[10.0, 15.0], [25.0, 30.0]])
+
+    with MultiSlitModel() as ms:
+        for i in range(2):
+            ms.slits.append(ImageModel(relsens=relsens.copy()))
+        ms.slits[1].relsens['response'] *= 2
+        assert_array_equal(
+            ms.interpolate_relsens([1.5, 2.5]),
+            [[15.0, 25.0], [30.0, 50.0]])
+        assert_array_equal(ms.interpolate_relsens(2.0), [20.0, 40.0])
+
+
+def test_pickle():
+    import pickle
+
+    with ImageModel((10, 10)) as im:
+        im.meta.instrument.name = 'NIRCAM'
+        im.data[...] = 42.0
+        im2 = pickle.loads(pickle.dumps(im, pickle.HIGHEST_PROTOCOL))
+
+    assert isinstance(im2, ImageModel)
+    assert str(im2.meta.date) == str(im.meta.date)
+    assert im2.meta.instrument.name == 'NIRCAM'
+    assert_array_equal(im2.data, im.data)
+    assert im2._files_to_close == []
+
+    # A schema extended at runtime is pickled along with the model
+    im.add_schema_entry('meta.foo', {'type': 'string', 'fits_keyword': 'FOO'})
+    im3 = pickle.loads(pickle.dumps(im))
+    assert im3._schema == im._schema
+
+
+def test_pickle_default_views():
+    import pickle
+
+    with ImageModel((1000, 1000)) as im:
+        # As when the model is stored in another tree
+        im._make_implicit_arrays(views=True)
+        data = pickle.dumps(im, pickle.HIGHEST_PROTOCOL)
+        assert len(data) < im.data.nbytes + 100000
+        im2 = pickle.loads(data)
+
+    assert im2._instance['dq'].strides == (0, 0)
+    assert im2.dq.shape == (1000, 1000)
+    assert im2.dq.flags.writeable
+    assert not im2.dq.any()
+
+
+def test_class_schema_is_shared():
+    with ImageModel((10, 10)) as im1:
+        with ImageModel() as im2:
+            assert im1._schema is im2._schema
+            assert im1._get_keyword_map() is im2._get_keyword_map()
+            assert im2.meta.date is not None
+            assert im1.copy()._schema is im1._schema
+
+            im2.add_schema_entry('meta.foo', {'type': 'string'})
+            assert im1._schema is not im2._schema
+            assert im1._get_keyword_map() is not im2._get_keyword_map()
+            assert not im2.copy()._default_schema
+
+
+def test_implicit_arrays_are_lazy():
+    with ImageModel((10, 10)) as im:
+        assert 'dq' not in im._instance
+        assert 'err' not in im._instance
+        im.save(TMP_FITS, clobber=True)
+        assert im.dq.shape == (10, 10)
+
+    from astropy.io import fits
+    with fits.open(TMP_FITS) as hdulist:
+        assert 'DQ' in hdulist
+        assert 'ERR' in hdulist
+
+    with MultiSlitModel() as ms:
+        ms.slits.append(ImageModel((4, 4)))
+        assert ms.slits[0].err.shape == (4, 4)
+
+
+def test_default_array_views():
+    from astropy.io import fits
+    from ..properties import DefaultArrayView, ListNode
+
+    with ImageModel((10, 10)) as im:
+        # Saving leaves the tree of the model as it is
+        im.save(TMP_FITS, clobber=True)
+        assert 'err' not in im._instance
+
+        im.save(TMP_FITS2, clobber=True, default_arrays='omit')
+        with fits.open(TMP_FITS2) as hdulist:
+            assert 'ERR' not in hdulist
+            assert 'DQ' not in hdulist
+
+        im._make_implicit_arrays(views=True)
+        view = im._instance['err']
+        assert isinstance(view, DefaultArrayView)
+        assert not view.flags.writeable
+
+        # Copies are views too
+        for view_copy in (copy.copy(view), copy.deepcopy(view)):
+            assert isinstance(view_copy, DefaultArrayView)
+            assert view_copy.strides == (0, 0)
+            assert not view_copy.flags.writeable
+
+        im.err[0, 0] = 1.0
+        assert not isinstance(im._instance['err'], DefaultArrayView)
+        assert im.err.sum() == 1.0
+
+    with ImageModel((4, 4)) as im:
+        im._make_implicit_arrays(views=True)
+        node = ListNode([im._instance['dq']], {'items': {}}, im)
+        assert not isinstance(node[0], DefaultArrayView)
+        assert node[0].flags.writeable
+        assert node[0].shape == (4, 4)
+
+    with fits.open(TMP_FITS) as hdulist:
+        assert hdulist['ERR'].data.shape == (10, 10)
+
+    with ImageModel(TMP_FITS2) as im:
+        assert im.err.shape == (10, 10)
+
+
+def test_asdf_block_options():
+    path = os.path.join(TMP_DIR, 'blocks.asdf')
+    data = np.random.rand(2, 3, 8, 8).astype(np.float32)
+    with RampModel(data=data) as dm:
+        dm.groupdq[0, 0, 0, 0] = 2
+        dm.save(path, array_storage={'data': 'streamed'},
+                array_compression={'groupdq': 'zlib', 'err': 'bz2'})
+
+    with RampModel(path) as dm:
+        assert_array_equal(dm.data, data)
+        assert dm.groupdq[0, 0, 0, 0] == 2
+        assert np.all(dm.err == 0)
+
+
+def test_asdf_block_schema_hints():
+    path = os.path.join(TMP_DIR, 'hints.asdf')
+    with ImageModel(data=np.zeros((8, 8), dtype=np.float32)) as dm:
+        dm.dq[0, 0] = 4
+        dm.add_schema_entry('dq', {'asdf_compression': 'zlib'})
+        dm.add_schema_entry('err', {'asdf_array_storage': 'inline'})
+        dm.save(path)
+
+        ff = AsdfFile.open(path)
+        try:
+            assert ff.get_array_compression(ff.tree['dq']) == 'zlib'
+            assert ff.get_array_storage(ff.tree['err']) == 'inline'
+            assert ff.get_array_storage(ff.tree['data']) == 'internal'
+        finally:
+            ff.close()
+
+        # Save keywords take precedence over the schema hints
+        dm.save(path, array_storage={'err': 'internal'},
+                array_compression={'dq': 'bz2'})
+
+        ff = AsdfFile.open(path)
+        try:
+            assert ff.get_array_compression(ff.tree['dq']) == 'bzp2'
+            assert ff.get_array_storage(ff.tree['err']) == 'internal'
+        finally:
+            ff.close()
+
+    with ImageModel(path) as dm:
+        assert dm.dq[0, 0] == 4
+
+
+@raises(ValueError)
+def test_asdf_two_streamed_arrays():
+    path = os.path.join(TMP_DIR, 'blocks.asdf')
+    with ImageModel(data=np.zeros((8, 8), dtype=np.float32),
+                    dq=np.zeros((8, 8), dtype=np.uint32)) as dm:
+        dm.save(path, array_storage={'data': 'streamed', 'dq': 'streamed'})
+
+
+def test_lazy_asdf():
+    from pyasdf.tags.core.ndarray import NDArrayType
+
+    path = os.path.join(TMP_DIR, 'lazy.asdf')
+    with ImageModel(data=np.arange(64, dtype=np.float32).reshape((8, 8))) as dm:
+        dm.save(path)
+
+    with ImageModel(path) as dm:
+        assert dm._asdf in dm._files_to_close
+        data = dm.data
+        assert not isinstance(data, NDArrayType)
+        assert data[1, 0] == 8
+        # Arrays read from the file can still be modified in place,
+        # without changing the file
+        data[0, 0] = 42
+        assert dm.data[0, 0] == 42
+
+    with ImageModel(path) as dm:
+        assert dm.data[0, 0] == 0
+
+
+def test_sniff_format():
+    from .. import util
+
+    fits_path = os.path.join(TMP_DIR, 'sniff.fits')
+    gzip_path = os.path.join(TMP_DIR, 'sniff.fits.gz')
+    asdf_path = os.path.join(TMP_DIR, 'sniff.asdf')
+    with ImageModel((8, 8)) as dm:
+        dm.save(fits_path)
+        dm.save(gzip_path)
+        dm.save(asdf_path)
+
+    assert util.sniff_format(fits_path) == ('fits', None)
+    assert util.sniff_format(gzip_path) == ('fits', 'gzip')
+    assert util.sniff_format(asdf_path) == ('asdf', None)
+    assert util.sniff_format(__file__) == (None, None)
+
+    # open only reads the tree to pick the class
+    from .. import _peek_asdf
+    assert _peek_asdf(asdf_path) == ((8, 8), False)
+
+    with open(asdf_path) as dm:
+        assert isinstance(dm, ImageModel)
+        assert dm.shape == (8, 8)
+
+
+def test_schema_lookups_are_memoized():
+    from .. import properties
+
+    with ImageModel() as dm:
+        schema = dm._schema
+        memo = dm._get_schema_memo('properties')
+        meta = properties._get_schema_for_property(schema, 'meta', memo)
+        assert meta != {}
+        assert memo[id(schema)][1]['meta'] is meta
+        assert properties._get_schema_for_property(schema, 'meta', memo) is meta
+
+        missing = properties._get_schema_for_property(
+            schema, 'not_there', memo)
+        assert missing == {}
+        missing['$schema'] = 'modified'
+        assert properties._get_schema_for_property(
+            schema, 'not_there', memo) == {}
+
+        # Shared by the instances using the class schema only
+        with ImageModel() as dm2:
+            assert dm2._get_schema_memo('properties') is memo
+            dm2.add_schema_entry('meta.foo', {'type': 'string'})
+            assert dm2._get_schema_memo('properties') is not memo
+
+
+def test_validate():
+    import jsonschema
+    from .. import properties
+
+    with ImageModel() as dm:
+        dm.meta.instrument.name = 'NIRCAM'
+        dm.validate()
+        memo = dm._get_schema_memo('validators')
+        validator = properties._get_validator(dm._schema, memo)
+        assert memo[id(dm._schema)][1] is validator
+        with ImageModel() as dm2:
+            dm2.validate()
+            assert properties._get_validator(
+                dm2._schema, dm2._get_schema_memo('validators')) is validator
+
+        dm._instance['meta']['instrument']['name'] = 'FOO'
+        try:
+            dm.validate()
+        except jsonschema.ValidationError:
+            pass
+        else:
+            assert False
+
+
+def test_validate_arrays_structurally():
+    import jsonschema
+    from .. import properties
+
+    with ImageModel((10, 10)) as dm:
+        tree = properties._to_tagged_tree(dm._instance, dm._asdf)
+        # The arrays themselves are validated, not a serialized form
+        assert tree['data'] is dm._instance['data']
+        dm.validate()
+
+        dm._instance['data'] = np.zeros((2, 2, 2), dtype=np.float32)
+        try:
+            dm.validate()
+        except jsonschema.ValidationError:
+            pass
+        else:
+            assert False
+
+
+def test_asn_members():
+    rootnames = [os.path.join(TMP_DIR, 'member{0}'.format(i))
+                 for i in range(3)]
+    for i, rootname in enumerate(rootnames[:2]):
+        with ImageModel(np.full((4, 4), i, dtype=np.float32)) as dm:
+            dm.save(rootname + '.fits')
+
+    table = np.rec.array(
+        [(rootnames[0], 'SCIENCE'), (rootnames[1], 'BACKGROUND'),
+         (rootnames[2], 'SCIENCE'), ('product', 'PRODUCT')],
+        dtype=[(str('expname'), 'S80'), (str('exptype'), 'S15')])
+
+    with AsnModel(asn_table=table) as asn:
+        # Members without a file are still counted, but not opened
+        assert asn.num_inputs == 3
+        assert asn.inputs == [rootnames[0] + '.fits', rootnames[1] + '.fits']
+        assert asn.output_rootname == 'product'
+        assert asn.output is None
+
+        for prefetch in (0, 1, 5):
+            members = list(asn.iter_members(ImageModel, prefetch=prefetch))
+            assert len(members) == 2
+            for i, member in enumerate(members):
+                with member:
+                    assert_array_equal(member.data, i)
+
+        # Stopping early closes the members that were opened ahead
+        opened = []
+
+        class Member(object):
+            def __init__(self, path):
+                self.closed = False
+                opened.append(self)
+
+            def close(self):
+                self.closed = True
+
+        members = asn.iter_members(Member, prefetch=1)
+        first = next(members)
+        members.close()
+        assert len(opened) == 2
+        assert not first.closed
+        assert all(x.closed for x in opened if x is not first)
+
+
+def test_stack_members():
+    from ..stacked import StackedView
+
+    rootnames = [os.path.join(TMP_DIR, 'stacked{0}'.format(i))
+                 for i in range(4)]
+    expected = np.empty((4, 6, 5), dtype=np.float32)
+    for i, rootname in enumerate(rootnames):
+        expected[i] = np.arange(30).reshape((6, 5)) + i * 100
+        with ImageModel(expected[i]) as dm:
+            dm.save(rootname + '.fits')
+
+    table = np.rec.array(
+        [(rootname, 'SCIENCE') for rootname in rootnames],
+        dtype=[(str('expname'), 'S80'), (str('exptype'), 'S15')])
+
+    opened = []
+
+    def open_member(path):
+        opened.append(path)
+        return ImageModel(path)
+
+    with AsnModel(asn_table=table) as asn:
+        with asn.stack_members(model_class=open_member, max_open=2) as stack:
+            assert stack.shape == (4, 6, 5)
+            assert stack.dtype == np.float32
+            # Only the first member is opened up front
+            assert len(opened) == 1
+
+            assert_array_equal(stack[2], expected[2])
+            assert_array_equal(stack[-1, 1:3], expected[-1, 1:3])
+            assert_array_equal(stack[1:3, 2:4, 1:3], expected[1:3, 2:4, 1:3])
+            assert_array_equal(stack[::-1, 0, 0], expected[::-1, 0, 0])
+            assert_array_equal(stack[[0, 3], ..., 4], expected[[0, 3], ..., 4])
+            assert stack[4:].shape == (0, 6, 5)
+
+            # Members 3 and 0 were the last ones read.  The first tile
+            # opens the others, and then each of the 3 other tiles
+            # reopens the two that are not open.
+            del opened[:]
+            median = np.empty((6, 5), dtype=np.float32)
+            for index, block in stack.iter_tiles((4, 4)):
+                assert block.shape[0] == 4
+                median[index] = np.median(block, axis=0)
+            assert_array_equal(median, np.median(expected, axis=0))
+            assert len(opened) == 3 + 3 * 2
+
+        # Closing the stack closes all of the members
+        del opened[:]
+        assert_array_equal(stack[1], expected[1])
+        assert len(opened) == 1
+        stack.close()
+
+    with StackedView([rootname + '.fits' for rootname in rootnames]) as stack:
+        assert_array_equal(stack[:, 0, 0], expected[:, 0, 0])
+
+    with ImageModel(np.zeros((2, 2), dtype=np.float32)) as dm:
+        dm.save(rootnames[3] + '.fits')
+    with StackedView([rootname + '.fits' for rootname in rootnames],
+                     model_class=ImageModel) as stack:
+        try:
+            stack[3]
+        except ValueError:
+            pass
+        else:
+            assert False
@@ -0,0 +1,106 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import os
+import shutil
+import tempfile
+
+from .. import DarkModel, ImageModel
+from .. import profiling
+
+TMP_FITS = None
+TMP_DIR = None
+
+
+def setup():
+    global TMP_DIR, TMP_FITS
+
+    TMP_DIR = tempfile.mkdtemp()
+    TMP_FITS = os.path.join(TMP_DIR, 'tmp.fits')
+
+
+def teardown():
+    shutil.rmtree(TMP_DIR)
+
+
+def test_disabled_by_default():
+    if profiling.is_enabled():
+        return
+
+    with ImageModel((50, 50)) as dm:
+        dm.save(TMP_FITS)
+        assert dm.profile_reports == []
+
+
+def test_profile_open_and_save():
+    with profiling.profile() as reports:
+        with ImageModel((50, 50)) as dm:
+            dm.save(TMP_FITS)
+        with ImageModel(TMP_FITS) as dm2:
+            pass
+
+    assert [x.operation for x in reports] == ['open', 'save', 'open']
+    assert dm.profile_reports == reports[:2]
+    assert dm2.profile_reports == reports[2:]
+
+    save = reports[1]
+    assert 'to_fits' in save.phases
+    assert save.bytes_written == os.path.getsize(TMP_FITS)
+
+    load = reports[2]
+    assert load.target == TMP_FITS
+    assert load.bytes_read > 0
+    if profiling._read_count() is None:
+        assert load.bytes_read == os.path.getsize(TMP_FITS)
+    for phase in ('fits.open', 'load_from_schema', 'load_extra_fits'):
+        assert load.phases[phase]['calls'] == 1
+    assert load.as_dict()['phases']['validate']['calls'] >= 1
+
+    # Only the data array is allocated by the constructor.  The
+    # implicit arrays are only allocated when first accessed.
+    assert reports[0].arrays_allocated == 1
+    assert reports[0].bytes_allocated == 50 * 50 * 4
+
+
+def test_profile_includes_subclass_constructor():
+    # DarkModel.__init__ reads dq_def after chaining up to
+    # DataModel.__init__, which allocates the (empty) default table.
+    with profiling.profile() as reports:
+        with DarkModel((50, 50)) as dm:
+            pass
+
+    assert len(reports) == 1
+    assert dm.profile_reports == reports
+    assert reports[0].arrays_allocated == 2
+    assert reports[0].bytes_allocated == 50 * 50 * 4
+
+
+def test_overlapping_profiles():
+    # As with one block per worker thread, the first block to exit
+    # must not stop the other one from recording.
+    first = profiling.profile()
+    second = profiling.profile()
+    first_reports = first.__enter__()
+    second_reports = second.__enter__()
+    with ImageModel((50, 50)) as dm:
+        pass
+    first.__exit__(None, None, None)
+    try:
+        assert profiling.is_enabled()
+        with ImageModel((50, 50)) as dm2:
+            pass
+    finally:
+        second.__exit__(None, None, None)
+
+    assert first_reports == dm.profile_reports
+    assert second_reports == dm.profile_reports + dm2.profile_reports
+    assert len(dm2.profile_reports) == 1
+
+
+def test_parse_flag():
+    for value in ('', '0', 'false', 'False', 'no', 'off', ' 0 '):
+        assert not profiling._parse_flag(value)
+    for value in ('1', 'true', 'yes', 'on'):
+        assert profiling._parse_flag(value)
@@ -0,0 +1,131 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import os
+import shutil
+import tempfile
+import threading
+
+from nose.tools import raises
+
+from .. import DarkModel, FlatModel, ImageModel
+from ..refcache import ReferenceCache
+
+TMP_DIR = None
+TMP_FITS = None
+TMP_FITS2 = None
+TMP_IMAGE = None
+
+
+def setup():
+    global TMP_DIR, TMP_FITS, TMP_FITS2, TMP_IMAGE
+
+    TMP_DIR = tempfile.mkdtemp()
+    TMP_FITS = os.path.join(TMP_DIR, 'tmp.fits')
+    TMP_FITS2 = os.path.join(TMP_DIR, 'tmp2.fits')
+    with DarkModel((2, 10, 10)) as dm:
+        dm.save(TMP_FITS)
+    with FlatModel((10, 10)) as dm:
+        dm.save(TMP_FITS2)
+    TMP_IMAGE = os.path.join(TMP_DIR, 'image.fits')
+    with ImageModel((10, 10)) as dm:
+        dm.save(TMP_IMAGE)
+
+
+def teardown():
+    shutil.rmtree(TMP_DIR)
+
+
+def test_cache_hit():
+    cache = ReferenceCache()
+    dark = cache.get(DarkModel, TMP_FITS)
+    assert cache.get(DarkModel, TMP_FITS) is dark
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert cache.nbytes == dark.data.nbytes + dark.dq.nbytes + dark.err.nbytes
+
+    # Another model class is a separate entry
+    assert cache.get(FlatModel, TMP_FITS) is not dark
+    assert len(cache) == 2
+
+    cache.flush()
+    assert len(cache) == 0
+    assert cache.get(DarkModel, TMP_FITS) is not dark
+
+
+@raises(ValueError)
+def test_read_only():
+    cache = ReferenceCache()
+    dark = cache.get(DarkModel, TMP_FITS)
+    dark.data[0, 0, 0] = 1.0
+
+
+@raises(ValueError)
+def test_read_only_metadata():
+    cache = ReferenceCache()
+    dark = cache.get(DarkModel, TMP_FITS)
+    dark.meta.telescope = 'JWST'
+
+
+@raises(ValueError)
+def test_read_only_default_array():
+    # An array that is only created when first accessed
+    cache = ReferenceCache()
+    image = cache.get(ImageModel, TMP_IMAGE)
+    assert image.area is image.area
+    image.area[0, 0] = 1.0
+
+
+def test_copy_is_writable():
+    cache = ReferenceCache()
+    dark = cache.get(DarkModel, TMP_FITS)
+    dark2 = dark.copy()
+    dark2.meta.telescope = 'JWST'
+    dark2.data[0, 0, 0] = 1.0
+    assert dark.meta.telescope is None
+    assert dark.data[0, 0, 0] == 0.0
+
+
+def test_concurrent_gets():
+    cache = ReferenceCache()
+    results = []
+
+    def get():
+        results.append(cache.get(DarkModel, TMP_FITS))
+
+    threads = [threading.Thread(target=get) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 4
+    assert all(x is results[0] for x in results)
+    assert cache.misses == 1
+    assert cache.hits == 3
+
+
+def test_modified_file():
+    path = os.path.join(TMP_DIR, 'modified.fits')
+    shutil.copy(TMP_FITS, path)
+    cache = ReferenceCache()
+    dark = cache.get(DarkModel, path)
+
+    with DarkModel((3, 10, 10)) as dm:
+        dm.save(path)
+    dark2 = cache.get(DarkModel, path)
+    assert dark2 is not dark
+    assert dark2.data.shape == (3, 10, 10)
+    assert cache.misses == 2
+    assert len(cache) == 1
+
+
+def test_eviction():
+    cache = ReferenceCache(max_bytes=1)
+    dark = cache.get(DarkModel, TMP_FITS)
+    cache.get(FlatModel, TMP_FITS2)
+    assert len(cache) == 1
+    assert cache.evictions == 1
+    assert cache.get(DarkModel, TMP_FITS) is not dark
@@ -0,0 +1,88 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, unicode_literals, print_function
+
+import os
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from .. import DarkModel
+from .. import shared
+
+
+def _check_share(method):
+    with DarkModel((2, 8, 8)) as dm:
+        dm.data[...] = np.arange(128).reshape((2, 8, 8))
+        dm.meta.instrument.name = 'MIRI'
+
+        with shared.share(dm, method=method) as handle:
+            handle = pickle.loads(pickle.dumps(handle))
+            with handle.open() as dm2:
+                assert isinstance(dm2, DarkModel)
+                assert dm2.meta.instrument.name == 'MIRI'
+                assert dm2.meta.date == dm.meta.date
+                assert_array_equal(dm2.data, dm.data)
+                assert dm2.dq.dtype == dm.dq.dtype
+                assert not dm2.data.flags.writeable
+
+
+def test_share_memmap():
+    _check_share('memmap')
+
+
+def test_share_shared_memory():
+    if shared.shared_memory is None:
+        return
+    _check_share('shared_memory')
+
+
+def _check_worker_unlink(method):
+    # Only the handle returned by share owns the storage
+    with DarkModel((2, 8, 8)) as dm:
+        with shared.share(dm, method=method) as handle:
+            copy = pickle.loads(pickle.dumps(handle))
+            copy.unlink()
+            with copy.open() as dm2:
+                assert_array_equal(dm2.data, dm.data)
+
+
+def test_worker_unlink_memmap():
+    _check_worker_unlink('memmap')
+
+
+def test_worker_unlink_shared_memory():
+    if shared.shared_memory is None:
+        return
+    _check_worker_unlink('shared_memory')
+
+
+def test_shared_memory_outlives_worker():
+    # A process attaching to the segments must not release them when
+    # it exits.
+    if shared.shared_memory is None:
+        return
+    root = os.path.abspath(os.path.join(
+        os.path.dirname(__file__), '..', '..', '..'))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + [x for x in [env.get('PYTHONPATH')] if x])
+    script = (
+        "import pickle, sys\n"
+        "handle = pickle.loads(sys.stdin.buffer.read())\n"
+        "handle.open().close()\n")
+
+    with DarkModel((2, 8, 8)) as dm:
+        dm.data[...] = 1.0
+        with shared.share(dm, method='shared_memory') as handle:
+            proc = subprocess.Popen(
+                [sys.executable, '-c', script], stdin=subprocess.PIPE,
+                env=env)
+            proc.communicate(pickle.dumps(handle))
+            assert proc.returncode == 0
+            with handle.open() as dm2:
+                assert_array_equal(dm2.data, dm.data)
@@ -75,3 +75,57 @@ def test_wcs():
         wcs5 = dm5.get_fits_wcs()
 
     assert wcs5.wcs.crpix[0] == 42.0
+
+
+def test_wcs_cache():
+    with ImageModel(FITS_FILE) as dm:
+        wcs1 = dm.get_fits_wcs()
+        wcs1.wcs.crpix[0] = 42.0
+
+        # Modifying the returned object must not leak into the cache
+        wcs2 = dm.get_fits_wcs()
+        assert wcs2.wcs.crpix[0] != 42.0
+
+        dm.set_fits_wcs(wcs1)
+        wcs3 = dm.get_fits_wcs()
+        assert wcs3.wcs.crpix[0] == 42.0
+
+
+def test_wcs_header_has_no_arrays():
+    from .. import fits_support
+
+    with ImageModel(FITS_FILE) as dm:
+        header = fits_support.get_fits_wcs_header(
+            dm._instance, dm._get_keyword_map())
+        assert 'CRPIX1' in header
+        assert 'FILENAME' not in header
+
+
+def test_wcs_pixel_shape():
+    from astropy.wcs import WCS
+    from .. import fits_support
+
+    with ImageModel((20, 30)) as dm:
+        wcs = WCS(naxis=2)
+        wcs.wcs.ctype = ['RA---TAN', 'DEC--TAN']
+        wcs.wcs.crval = [10.0, 20.0]
+        wcs.wcs.cdelt = [-0.0001, 0.0001]
+        dm.set_fits_wcs(wcs, hdu_name='SCI')
+
+        header = fits_support.get_fits_wcs_header(
+            dm._instance, dm._get_keyword_map(), 'SCI')
+        assert header['NAXIS'] == 2
+        assert header['NAXIS1'] == 30
+        assert header['NAXIS2'] == 20
+
+        footprint = dm.get_fits_wcs('SCI').calc_footprint()
+        assert footprint.shape == (4, 2)
+
+
+def test_wcs_cache_sees_raw_writes():
+    with ImageModel(FITS_FILE) as dm:
+        crpix = dm.get_fits_wcs().wcs.crpix[0]
+        for card in dm._instance['extra_fits']['PRIMARY']['header']:
+            if card[0] == 'CRPIX1':
+                card[1] = crpix + 1.0
+        assert dm.get_fits_wcs().wcs.crpix[0] == crpix + 1.0
@@ -3,11 +3,16 @@ Various utility functions and data types
 """
 from __future__ import absolute_import, unicode_literals, division, print_function
 
+import bz2
+import copy
+import gzip
+import io
 import sys
 
 import numpy as np
 
 from astropy.extern import six
+from astropy.io import fits
 
 def can_broadcast(a, b):
     """
@@ -47,6 +52,69 @@ else:
         return name
 
 
+# Maps (in_dtype, out_dtype) to the dtype that tables of in_dtype are
+# viewed as by `gentle_asarray`, or to None if they must be copied.
+_view_dtypes = {}
+
+
+def _get_view_dtype(in_dtype, out_dtype):
+    key = (in_dtype, out_dtype)
+    try:
+        return _view_dtypes[key]
+    except KeyError:
+        pass
+
+    if len(in_dtype) != len(out_dtype):
+        raise ValueError(
+            "Wrong number of columns.  Expected {0}, got {1}".format(
+                len(out_dtype), len(in_dtype)))
+
+    formats = []
+    for in_name, out_name in zip(in_dtype.names, out_dtype.names):
+        in_type = in_dtype.fields[in_name][0]
+        if not np.can_cast(in_type, out_dtype.fields[out_name][0], 'equiv'):
+            view_dtype = None
+            break
+        formats.append(in_type)
+    else:
+        # The offsets are kept, so that this also works for tables
+        # with padding between the columns.
+        view_dtype = np.dtype({
+            'names': list(out_dtype.names),
+            'formats': formats,
+            'offsets': [in_dtype.fields[name][1] for name in in_dtype.names],
+            'itemsize': in_dtype.itemsize})
+
+    _view_dtypes[key] = view_dtype
+    return view_dtype
+
+
+def _get_fits_rec_storage(a):
+    # A FITS_rec converts some of its columns (scaled, logical, string,
+    # etc.) from how they are stored in the file when they are
+    # accessed, and keeps them in `_converted`, where they may also
+    # have been modified.  If none of them need it, its storage can be
+    # used as a plain record array, which still allows attribute
+    # access to columns.
+    storage = a.view(np.recarray)
+    for column, name in zip(a.columns, a.dtype.names):
+        if column.bscale not in (None, 1) or column.bzero not in (None, 0):
+            return None
+        raw = a.dtype.fields[name][0]
+        if raw.base.kind in 'SU':
+            # The FITS_rec strips the padding of strings
+            return None
+        dtype = getattr(column, 'dtype', None)
+        if (dtype is None or
+                dtype.base.kind != raw.base.kind or
+                dtype.base.itemsize != raw.base.itemsize):
+            return None
+    for converted in six.itervalues(getattr(a, '_converted', {})):
+        if not np.may_share_memory(converted, storage):
+            return None
+    return storage
+
+
 def gentle_asarray(a, dtype):
     """
     Performs an asarray that doesn't cause a copy if the byteorder is
@@ -65,26 +133,14 @@ def gentle_asarray(a, dtype):
         elif in_dtype.fields is not None and out_dtype.fields is not None:
             if in_dtype == out_dtype:
                 return a
-            if len(in_dtype) != len(out_dtype):
-                raise ValueError(
-                    "Wrong number of columns.  Expected {0}, got {1}".format(
-                        len(out_dtype), len(in_dtype)))
-            new_dtype = []
-            for i in xrange(len(out_dtype.fields)):
-                in_type = in_dtype[i]
-                out_type = out_dtype[i]
-                if in_type.subdtype is None:
-                    type_str = in_type.str
-                else:
-                    type_str = in_type.subdtype[0].str
-                if np.can_cast(in_type, out_type, 'equiv'):
-                    new_dtype.append(
-                        (out_dtype.names[i],
-                         type_str,
-                         in_type.shape))
-                else:
-                    return np.asarray(a, dtype=out_dtype)
-            return a.view(dtype=np.dtype(new_dtype))
+            view_dtype = _get_view_dtype(in_dtype, out_dtype)
+            if view_dtype is None:
+                return np.asarray(a, dtype=out_dtype)
+            if isinstance(a, fits.FITS_rec):
+                storage = _get_fits_rec_storage(a)
+                if storage is not None:
+                    a = storage
+            return a.view(dtype=view_dtype)
 
     return np.asarray(a, dtype=out_dtype)
 
@@ -106,3 +162,274 @@ def ensure_ascii(s):
         if six.PY3:
             s = s.decode('ascii')
     return s
+
+
+def get_cached(owner, name, sources, make):
+    """
+    Returns the value of ``make()``, cached on *owner* under *name*
+    for as long as each of the objects in *sources* (usually arrays
+    from the model tree) is the same object.
+    """
+    cache = owner.__dict__.setdefault('_derived_cache', {})
+    entry = cache.get(name)
+    if (entry is None or len(entry[0]) != len(sources) or
+        any(a is not b for a, b in zip(entry[0], sources))):
+        entry = cache[name] = (tuple(sources), make())
+    return entry[1]
+
+
+class RowInterpolator(object):
+    """
+    Linear interpolation of many tabulated curves at once.
+
+    Each row of *x* and *y* is a curve, of which only the first
+    *counts* elements are used.  The rows are sorted on *x* once, when
+    the interpolator is created, and concatenated into a single grid
+    in which each row is shifted past the end of the previous one, so
+    that evaluating every row is a single `numpy.searchsorted` call.
+
+    As with `numpy.interp`, values outside of the range of a curve
+    take the value of its nearest end.  Rows with no elements
+    evaluate to NaN.
+
+    Parameters
+    ----------
+    x, y : 2-D arrays
+        The tabulated curves, one per row.
+
+    counts : 1-D int array, optional
+        The number of valid elements in each row.  By default, all of
+        the elements are used.
+    """
+    def __init__(self, x, y, counts=None):
+        x = np.array(x, dtype=np.float64, ndmin=2)
+        y = np.array(y, dtype=np.float64, ndmin=2)
+        nrows, width = x.shape
+        if counts is None:
+            counts = np.empty((nrows,), dtype=np.intp)
+            counts[:] = width
+        else:
+            counts = np.clip(np.asarray(counts, dtype=np.intp), 0, width)
+
+        rows = np.arange(nrows)
+        valid = np.arange(width)[np.newaxis, :] < counts[:, np.newaxis]
+        x[~valid] = np.inf
+        order = np.argsort(x, axis=1, kind='mergesort')
+        x = x[rows[:, np.newaxis], order]
+        y = y[rows[:, np.newaxis], order]
+
+        # Pad each row with its last value, plus one extra column, so
+        # that each row is finite, non-decreasing and at least two
+        # elements wide.
+        last = np.maximum(counts - 1, 0)
+        first_x = x[:, 0].copy()
+        last_x = x[rows, last]
+        last_y = y[rows, last]
+        x = np.hstack([x, last_x[:, np.newaxis]])
+        y = np.hstack([y, last_y[:, np.newaxis]])
+        pad = np.hstack([~valid, np.ones((nrows, 1), dtype=bool)])
+        x = np.where(pad, last_x[:, np.newaxis], x)
+        y = np.where(pad, last_y[:, np.newaxis], y)
+
+        empty = counts == 0
+        x[empty] = 0.0
+        first_x[empty] = 0.0
+        last_x[empty] = 0.0
+
+        if nrows and not np.all(empty):
+            lo = np.min(x[~empty])
+            span = np.max(x[~empty]) - lo + 1.0
+        else:
+            lo = 0.0
+            span = 1.0
+        self._offsets = rows * span - lo
+        self._flat = (x + self._offsets[:, np.newaxis]).ravel()
+        self._x = x.ravel()
+        self._y = y.ravel()
+        self._first = first_x
+        self._last = last_x
+        self._width = width + 1
+        self._empty = empty
+        self.nrows = nrows
+
+    def __call__(self, x, rows=None):
+        """
+        Evaluate the curves.
+
+        Parameters
+        ----------
+        x : scalar, 1-D or 2-D array
+            The positions at which to evaluate the curves.  A scalar
+            or 1-D array is evaluated for every row; a 2-D array gives
+            separate positions for each row.
+
+        rows : 1-D int array, optional
+            The rows to evaluate.  By default, all rows are evaluated.
+
+        Returns
+        -------
+        values : array
+            Of shape ``(nrows,)`` for a scalar *x*, and otherwise
+            ``(nrows, n)``.
+        """
+        if rows is None:
+            rows = np.arange(self.nrows)
+        else:
+            rows = np.asarray(rows, dtype=np.intp)
+        x = np.asarray(x, dtype=np.float64)
+        scalar = x.ndim == 0
+        if x.ndim < 2:
+            x = np.repeat(np.atleast_1d(x)[np.newaxis, :], len(rows), 0)
+        elif x.shape[0] != len(rows):
+            raise ValueError(
+                "Expected positions for {0} rows, got {1}".format(
+                    len(rows), x.shape[0]))
+
+        x = np.minimum(np.maximum(x, self._first[rows][:, np.newaxis]),
+                       self._last[rows][:, np.newaxis])
+        start = (rows * self._width)[:, np.newaxis]
+        index = np.searchsorted(
+            self._flat, (x + self._offsets[rows][:, np.newaxis]).ravel(),
+            side='right').reshape(x.shape)
+        index = np.clip(index, start + 1, start + self._width - 1)
+
+        x0 = self._x[index - 1]
+        x1 = self._x[index]
+        y0 = self._y[index - 1]
+        y1 = self._y[index]
+        dx = x1 - x0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(dx > 0, (x - x0) / dx, 0.0)
+        values = y0 + t * (y1 - y0)
+        values[self._empty[rows]] = np.nan
+
+        if scalar:
+            return values[:, 0]
+        return values
+
+    @classmethod
+    def from_tables(cls, tables, x_column, y_column):
+        """
+        Create an interpolator from a sequence of 1-D tables of
+        differing lengths, with one curve per table.
+        """
+        counts = np.array([len(table) for table in tables], dtype=np.intp)
+        width = max(counts.max() if len(counts) else 0, 1)
+        x = np.zeros((len(tables), width))
+        y = np.zeros((len(tables), width))
+        for i, table in enumerate(tables):
+            x[i, :counts[i]] = table[x_column]
+            y[i, :counts[i]] = table[y_column]
+        return cls(x, y, counts)
+
+
+def map_arrays(node, types, func):
+    """
+    Returns a copy of the tree in which each of the values of the
+    given types is replaced by ``func(value)``.  Only the dicts and
+    lists of the tree are copied.
+    """
+    if isinstance(node, types):
+        return func(node)
+    elif isinstance(node, (dict, list)):
+        result = copy.copy(node)
+        if isinstance(node, dict):
+            keys = list(node.keys())
+        else:
+            keys = range(len(node))
+        for key in keys:
+            result[key] = map_arrays(node[key], types, func)
+        return result
+    return node
+
+
+def iter_arrays(node, types):
+    """
+    Iterates over all of the values of the given types in a tree of
+    dicts and lists.
+    """
+    if isinstance(node, types):
+        yield node
+    elif isinstance(node, dict):
+        for val in six.itervalues(node):
+            for x in iter_arrays(val, types):
+                yield x
+    elif isinstance(node, list):
+        for val in node:
+            for x in iter_arrays(val, types):
+                yield x
+
+
+_FORMAT_MAGIC = [
+    (b'SIMPLE  =', 'fits'),
+    (b'#ASDF', 'asdf')
+    ]
+
+
+_COMPRESSION_MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bzip2')
+    ]
+
+
+_DECOMPRESSORS = {
+    'gzip': gzip.GzipFile,
+    'bzip2': bz2.BZ2File
+    }
+
+
+def open_compressed(path, compression):
+    """
+    Opens a compressed file for reading its decompressed content.
+
+    Parameters
+    ----------
+    path : str
+
+    compression : str
+        ``'gzip'`` or ``'bzip2'``, as returned by `sniff_format`.
+
+    Returns
+    -------
+    fd : readable file object
+    """
+    return _DECOMPRESSORS[compression](path, 'rb')
+
+
+def sniff_format(path):
+    """
+    Identifies the format of a file from its first few bytes, looking
+    through gzip or bzip2 compression.
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    file_format : str or None
+        ``'fits'``, ``'asdf'``, or `None` if the format was not
+        recognized.
+
+    compression : str or None
+        ``'gzip'``, ``'bzip2'`` or `None`.
+    """
+    size = max(len(magic) for magic, _ in _FORMAT_MAGIC)
+    with io.open(path, 'rb') as fd:
+        head = fd.read(size)
+
+    compression = None
+    for magic, name in _COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            compression = name
+            try:
+                with open_compressed(path, compression) as fd:
+                    head = fd.read(size)
+            except (IOError, EOFError):
+                return None, compression
+            break
+
+    for magic, name in _FORMAT_MAGIC:
+        if head.startswith(magic):
+            return name, compression
+    return None, compression